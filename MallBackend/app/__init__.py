@@ -1,7 +1,15 @@
-from flask import Flask, send_from_directory, jsonify, request, current_app
+from flask import (
+    Flask,
+    abort,
+    send_file,
+    send_from_directory,
+    jsonify,
+    request,
+    current_app,
+)
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager
+from .jwt_cache import CachingJWTManager
 import os
 from dotenv import load_dotenv
 from flask_swagger_ui import get_swaggerui_blueprint
@@ -13,14 +21,21 @@ load_dotenv()
 
 db = SQLAlchemy()
 migrate = Migrate()
-jwt = JWTManager()
+jwt = CachingJWTManager()
 
 
 def create_app():
     # 使用绝对路径指定静态文件夹
     base_dir = os.path.abspath(os.path.dirname(__file__))
     static_path = os.path.join(base_dir, "..", "static")
-    app = Flask(__name__, static_folder=static_path)
+    # 静态文件由下方的 serve_static 提供（含缩略图），不注册 Flask 自带的
+    # static 路由，否则同一 URL 规则会先匹配到自带路由
+    app = Flask(__name__, static_folder=None)
+
+    # jsonify 按 Accept 头返回 JSON 或 MessagePack（所有蓝图共用）
+    from .serializer import ResponseSerializer
+
+    app.json = ResponseSerializer(app)
 
     # 配置详细的SQL日志
     if app.config.get("FLASK_ENV") == "development":
@@ -34,7 +49,18 @@ def create_app():
             r"/api/*": {
                 "origins": "*",
                 "supports_credentials": True,
-                "allow_headers": ["Content-Type", "Authorization"],
+                "allow_headers": [
+                    "Content-Type",
+                    "Authorization",
+                    "X-Feed-Cursor",
+                    "If-None-Match",
+                ],
+                "expose_headers": [
+                    "X-Feed-Cursor",
+                    "X-Next-Cursor",
+                    "X-Search-Mode",
+                    "ETag",
+                ],
             }
         },
     )
@@ -57,6 +83,154 @@ def create_app():
     app.config["JWT_DECODE_ALGORITHMS"] = ["HS256"]  # 指定可接受的算法列表
     # 避免传递不必要的参数
     app.config["JWT_ADDITIONAL_HEADERS"] = {}  # 明确设置为空
+    # 已撤销令牌缓存与数据库的同步间隔(s)
+    app.config["TOKEN_REVOCATION_SYNC_INTERVAL"] = int(
+        os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", "10")
+    )
+    # 增量同步时重新读取最近多少秒内写入的黑名单记录，需大于写黑名单事务的最长耗时
+    app.config["TOKEN_REVOCATION_SYNC_MARGIN"] = int(
+        os.getenv("TOKEN_REVOCATION_SYNC_MARGIN", "60")
+    )
+    # 令牌撤销方式: blacklist 按JTI写黑名单; version 修改密码/注销账户时递增
+    # 用户的 token_version，其他 worker 在用户缓存过期(USER_CACHE_TTL)后生效
+    app.config["TOKEN_REVOCATION_MODE"] = os.getenv(
+        "TOKEN_REVOCATION_MODE", "blacklist"
+    )
+    # 已验证令牌的解码缓存容量与最长缓存时间(s)，条目不会超过令牌本身的有效期
+    app.config["JWT_DECODE_CACHE_SIZE"] = int(
+        os.getenv("JWT_DECODE_CACHE_SIZE", "10000")
+    )
+    app.config["JWT_DECODE_CACHE_TTL"] = int(os.getenv("JWT_DECODE_CACHE_TTL", "600"))
+    # 商品目录快照：内存中最多保存的商品数、快照最长使用时间(s)、数据库抽样分段大小
+    app.config["CATALOG_SNAPSHOT_MAX_ITEMS"] = int(
+        os.getenv("CATALOG_SNAPSHOT_MAX_ITEMS", "50000")
+    )
+    app.config["CATALOG_SNAPSHOT_MAX_AGE"] = int(
+        os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "30")
+    )
+    app.config["CATALOG_SAMPLE_STRIDE"] = int(os.getenv("CATALOG_SAMPLE_STRIDE", "100"))
+    # 热度商品流：加购热度半衰期(小时)与后台刷新间隔(s)
+    app.config["POPULARITY_HALF_LIFE_HOURS"] = float(
+        os.getenv("POPULARITY_HALF_LIFE_HOURS", "72")
+    )
+    app.config["POPULARITY_REFRESH_INTERVAL"] = int(
+        os.getenv("POPULARITY_REFRESH_INTERVAL", "300")
+    )
+    # 商品倒排索引全量重建间隔(s)；其他 worker 的修改在查询时已按目录版本号增量同步
+    app.config["SEARCH_INDEX_REBUILD_INTERVAL"] = int(
+        os.getenv("SEARCH_INDEX_REBUILD_INTERVAL", "600")
+    )
+    # 查询时发现其他 worker 的商品修改超过该条数时，改为全量重建搜索索引
+    app.config["SEARCH_SYNC_MAX_CHANGES"] = int(
+        os.getenv("SEARCH_SYNC_MAX_CHANGES", "1000")
+    )
+    # 倒排表中失效文档数超过有效文档数的该倍数时，查询前全量重建以回收空间
+    app.config["SEARCH_COMPACT_DEAD_RATIO"] = float(
+        os.getenv("SEARCH_COMPACT_DEAD_RATIO", "0.5")
+    )
+    # 商品搜索 BM25 参数，名称匹配的权重是描述匹配的 SEARCH_NAME_WEIGHT 倍
+    app.config["SEARCH_NAME_WEIGHT"] = float(os.getenv("SEARCH_NAME_WEIGHT", "2.0"))
+    app.config["SEARCH_BM25_K1"] = float(os.getenv("SEARCH_BM25_K1", "1.2"))
+    app.config["SEARCH_BM25_B"] = float(os.getenv("SEARCH_BM25_B", "0.75"))
+    # 容错搜索：三元组命中比例阈值、每次查询最多读取的倒排记录数与返回数量上限
+    app.config["SEARCH_FUZZY_THRESHOLD"] = float(
+        os.getenv("SEARCH_FUZZY_THRESHOLD", "0.4")
+    )
+    app.config["SEARCH_FUZZY_MAX_POSTINGS"] = int(
+        os.getenv("SEARCH_FUZZY_MAX_POSTINGS", "200000")
+    )
+    app.config["SEARCH_FUZZY_LIMIT"] = int(os.getenv("SEARCH_FUZZY_LIMIT", "20"))
+    # 搜索结果缓存容量与有效期(s)；热门搜索词保存位置、数量与保存间隔(s)
+    app.config["SEARCH_CACHE_SIZE"] = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+    app.config["SEARCH_CACHE_TTL"] = int(os.getenv("SEARCH_CACHE_TTL", "600"))
+    app.config["SEARCH_TOP_QUERIES_PATH"] = os.getenv(
+        "SEARCH_TOP_QUERIES_PATH",
+        os.path.join(app.instance_path, "search_top_queries.json"),
+    )
+    app.config["SEARCH_WARM_QUERIES"] = int(os.getenv("SEARCH_WARM_QUERIES", "50"))
+    app.config["SEARCH_TOP_QUERIES_SAVE_INTERVAL"] = int(
+        os.getenv("SEARCH_TOP_QUERIES_SAVE_INTERVAL", "300")
+    )
+    # 商品列表与搜索结果的默认每页数量与上限
+    app.config["PRODUCT_PAGE_SIZE"] = int(os.getenv("PRODUCT_PAGE_SIZE", "20"))
+    app.config["PRODUCT_PAGE_MAX_SIZE"] = int(os.getenv("PRODUCT_PAGE_MAX_SIZE", "100"))
+    # 商品删除记录的保留天数，早于保留期的增量同步请求会收到全量数据
+    app.config["PRODUCT_TOMBSTONE_RETENTION_DAYS"] = int(
+        os.getenv("PRODUCT_TOMBSTONE_RETENTION_DAYS", "30")
+    )
+    # 商品详情响应缓存容量与有效期(s)，有效期决定其他 worker 修改商品后的最长延迟
+    app.config["PRODUCT_DETAIL_CACHE_SIZE"] = int(
+        os.getenv("PRODUCT_DETAIL_CACHE_SIZE", "10000")
+    )
+    app.config["PRODUCT_DETAIL_CACHE_TTL"] = int(
+        os.getenv("PRODUCT_DETAIL_CACHE_TTL", "60")
+    )
+    # 缩略图目录、可选宽度(px)、有损格式质量、预生成线程数与浏览器缓存时间(s)
+    app.config["THUMBNAIL_CACHE_DIR"] = os.getenv(
+        "THUMBNAIL_CACHE_DIR", os.path.join(app.instance_path, "thumbnails")
+    )
+    app.config["THUMBNAIL_WIDTHS"] = [
+        int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "100,200,400").split(",")
+    ]
+    app.config["THUMBNAIL_QUALITY"] = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+    app.config["THUMBNAIL_WORKERS"] = int(os.getenv("THUMBNAIL_WORKERS", "1"))
+    app.config["THUMBNAIL_MAX_AGE"] = int(os.getenv("THUMBNAIL_MAX_AGE", "86400"))
+    # 响应压缩：最小压缩长度(字节)、gzip 压缩级别与 brotli 质量
+    app.config["COMPRESSION_MIN_SIZE"] = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    app.config["COMPRESSION_GZIP_LEVEL"] = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    app.config["COMPRESSION_BR_QUALITY"] = int(os.getenv("COMPRESSION_BR_QUALITY", "4"))
+    # 静态文件预压缩版本的保存目录
+    app.config["ASSET_VARIANT_DIR"] = os.getenv(
+        "ASSET_VARIANT_DIR", os.path.join(app.instance_path, "assets")
+    )
+    # 过期令牌分批清理的每批行数
+    app.config["TOKEN_CLEANUP_CHUNK_SIZE"] = int(
+        os.getenv("TOKEN_CLEANUP_CHUNK_SIZE", "1000")
+    )
+    # 用户身份缓存容量与有效期(s)
+    app.config["USER_CACHE_SIZE"] = int(os.getenv("USER_CACHE_SIZE", "4096"))
+    app.config["USER_CACHE_TTL"] = int(os.getenv("USER_CACHE_TTL", "60"))
+    # 密码哈希进程池：进程数、最大排队数、超时(s)与503时的 Retry-After(s)
+    app.config["PASSWORD_HASH_WORKERS"] = int(
+        os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+    )
+    app.config["PASSWORD_HASH_QUEUE_SIZE"] = int(
+        os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32")
+    )
+    app.config["PASSWORD_HASH_TIMEOUT"] = int(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+    app.config["PASSWORD_HASH_RETRY_AFTER"] = int(
+        os.getenv("PASSWORD_HASH_RETRY_AFTER", "1")
+    )
+
+    # 限流配置：令牌桶速率(个/秒)与容量
+    app.config["RATELIMIT_ENABLED"] = (
+        os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
+    )
+    # memory:// 仅对当前 worker 生效；sqlite:///<路径> 可在同一主机的 worker 间共享
+    app.config["RATELIMIT_STORAGE_URL"] = os.getenv(
+        "RATELIMIT_STORAGE_URL", "memory://"
+    )
+    # 登录：按用户名限流
+    app.config["RATELIMIT_LOGIN_USER_RATE"] = float(
+        os.getenv("RATELIMIT_LOGIN_USER_RATE", "0.2")
+    )
+    app.config["RATELIMIT_LOGIN_USER_BURST"] = int(
+        os.getenv("RATELIMIT_LOGIN_USER_BURST", "5")
+    )
+    # 登录：按客户端IP限流
+    app.config["RATELIMIT_LOGIN_IP_RATE"] = float(
+        os.getenv("RATELIMIT_LOGIN_IP_RATE", "1")
+    )
+    app.config["RATELIMIT_LOGIN_IP_BURST"] = int(
+        os.getenv("RATELIMIT_LOGIN_IP_BURST", "20")
+    )
+    # AI聊天：按用户ID限流
+    app.config["RATELIMIT_AI_CHAT_RATE"] = float(
+        os.getenv("RATELIMIT_AI_CHAT_RATE", "0.5")
+    )
+    app.config["RATELIMIT_AI_CHAT_BURST"] = int(
+        os.getenv("RATELIMIT_AI_CHAT_BURST", "10")
+    )
 
     # 火山方舟API配置
     app.config["ARK_API_KEY"] = os.getenv("ARK_API_KEY")
@@ -72,6 +246,115 @@ def create_app():
     jwt.init_app(app)
     migrate.init_app(app, db)
 
+    # 进程内已撤销令牌缓存、用户身份缓存与令牌解码缓存
+    from .cache import RevokedTokenCache, TTLCache
+
+    app.extensions["revocation_cache"] = RevokedTokenCache(
+        sync_interval=app.config["TOKEN_REVOCATION_SYNC_INTERVAL"],
+        sync_margin=app.config["TOKEN_REVOCATION_SYNC_MARGIN"],
+    )
+    app.extensions["user_cache"] = TTLCache(
+        maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"]
+    )
+    app.extensions["jwt_decode_cache"] = TTLCache(
+        maxsize=app.config["JWT_DECODE_CACHE_SIZE"],
+        ttl=app.config["JWT_DECODE_CACHE_TTL"],
+    )
+
+    app.extensions["product_detail_cache"] = TTLCache(
+        maxsize=app.config["PRODUCT_DETAIL_CACHE_SIZE"],
+        ttl=app.config["PRODUCT_DETAIL_CACHE_TTL"],
+    )
+
+    # 商品目录快照
+    from .catalog import Catalog
+
+    app.extensions["catalog"] = Catalog(
+        max_items=app.config["CATALOG_SNAPSHOT_MAX_ITEMS"],
+        max_age=app.config["CATALOG_SNAPSHOT_MAX_AGE"],
+        stride=app.config["CATALOG_SAMPLE_STRIDE"],
+    )
+
+    # 热度商品流（别名表由后台任务刷新）
+    from .feed import PopularityFeed
+
+    app.extensions["popularity_feed"] = PopularityFeed(
+        half_life_hours=app.config["POPULARITY_HALF_LIFE_HOURS"]
+    )
+
+    # 商品搜索倒排索引
+    from .search import SearchIndex
+
+    app.extensions["search_index"] = SearchIndex(
+        name_weight=app.config["SEARCH_NAME_WEIGHT"],
+        k1=app.config["SEARCH_BM25_K1"],
+        b=app.config["SEARCH_BM25_B"],
+        fuzzy_threshold=app.config["SEARCH_FUZZY_THRESHOLD"],
+        fuzzy_max_postings=app.config["SEARCH_FUZZY_MAX_POSTINGS"],
+    )
+
+    # 热门搜索结果缓存
+    from .search import QueryLog
+
+    app.extensions["search_cache"] = TTLCache(
+        maxsize=app.config["SEARCH_CACHE_SIZE"], ttl=app.config["SEARCH_CACHE_TTL"]
+    )
+    app.extensions["search_query_log"] = QueryLog()
+
+    # 商品名称自动补全索引
+    from .suggest import SuggestIndex
+
+    app.extensions["suggest_index"] = SuggestIndex()
+
+    # 商品图片缩略图
+    from .thumbnails import ThumbnailStore
+
+    app.extensions["thumbnails"] = ThumbnailStore(
+        source_dir=static_path,
+        cache_dir=app.config["THUMBNAIL_CACHE_DIR"],
+        widths=app.config["THUMBNAIL_WIDTHS"],
+        quality=app.config["THUMBNAIL_QUALITY"],
+        workers=app.config["THUMBNAIL_WORKERS"],
+    )
+
+    # 静态文件清单（内容哈希与预压缩版本）
+    from .assets import (
+        AssetManifest,
+        IMMUTABLE_CACHE_CONTROL,
+        REVALIDATE_CACHE_CONTROL,
+        send_asset,
+    )
+
+    app.extensions["assets"] = AssetManifest(
+        static_dir=static_path, variant_dir=app.config["ASSET_VARIANT_DIR"]
+    )
+
+    # 密码哈希进程池
+    from .hashing import PasswordHasher, HasherBusy
+
+    app.extensions["password_hasher"] = PasswordHasher(
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_pending=app.config["PASSWORD_HASH_QUEUE_SIZE"],
+        timeout=app.config["PASSWORD_HASH_TIMEOUT"],
+        retry_after=app.config["PASSWORD_HASH_RETRY_AFTER"],
+    )
+    # 在服务线程与后台任务启动前 fork 哈希子进程
+    app.extensions["password_hasher"].start()
+
+    # 限流器，存储后端可替换为跨 worker 共享的实现
+    from .ratelimit import RateLimiter, create_backend
+
+    app.extensions["rate_limiter"] = RateLimiter(
+        create_backend(app.config["RATELIMIT_STORAGE_URL"])
+    )
+
+    @app.errorhandler(HasherBusy)
+    def hasher_busy_callback(error):
+        response = jsonify({"status": "error", "error": error.description})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(error.retry_after)
+        return response
+
     # 配置 Swagger UI
     SWAGGER_URL = "/api/docs"
     API_URL = "/static/swagger.json"
@@ -110,15 +393,11 @@ def create_app():
     app.register_blueprint(swaggerui_blueprint)
 
     # 添加黑名单检查回调
-    from .models import TokenBlacklist
-
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        """检查令牌是否在黑名单中"""
+        """检查令牌是否在黑名单中（优先查询进程内缓存）"""
         jti = jwt_payload["jti"]
-        # 使用应用上下文中的db对象
-        token = TokenBlacklist.query.filter_by(jti=jti).first()
-        return token is not None
+        return current_app.extensions["revocation_cache"].is_revoked(jti)
 
     # 添加自定义错误处理器
     @jwt.invalid_token_loader
@@ -177,9 +456,39 @@ def create_app():
         )
 
     # 显式添加静态文件路由
+    # 静态文件：带内容哈希的URL（如 /static/hw.3fa9c2d1e0b4.png）可永久缓存，
+    # 原URL按 ETag 重新验证；带 w 参数时返回缩略图，如 /static/hw.png?w=200
     @app.route("/static/<path:filename>")
     def serve_static(filename):
-        return send_from_directory(static_path, filename)
+        assets = app.extensions["assets"]
+        name, immutable = assets.resolve(filename)
+        if "w" not in request.args:
+            asset = assets.get(name)
+            if asset is None:
+                return send_from_directory(static_path, filename)
+            cache_control = (
+                IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+            )
+            return send_asset(asset, cache_control)
+
+        width = request.args.get("w", type=int)
+        if width is None or width <= 0:
+            return jsonify({"status": "error", "error": "无效的图片宽度"}), 400
+        try:
+            path, mimetype = app.extensions["thumbnails"].get(
+                name, width, request.args.get("format")
+            )
+        except FileNotFoundError:
+            abort(404)
+        except ValueError as e:
+            return jsonify({"status": "error", "error": str(e)}), 400
+        # 缩略图文件名包含原图内容哈希，内容不变时 ETag 不变
+        response = send_file(
+            path, mimetype=mimetype, max_age=app.config["THUMBNAIL_MAX_AGE"]
+        )
+        if immutable:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
 
     # 添加请求钩子调试Authorization头（仅在开发环境启用）
     if app.config.get("FLASK_ENV") == "development":
@@ -196,6 +505,16 @@ def create_app():
                 app.logger.debug(f"修正后Authorization头: {corrected}")
             return None
 
+    # 响应压缩（最后注册，最先执行）
+    from .compression import ResponseCompressor
+
+    app.extensions["compressor"] = ResponseCompressor(
+        min_size=app.config["COMPRESSION_MIN_SIZE"],
+        gzip_level=app.config["COMPRESSION_GZIP_LEVEL"],
+        br_quality=app.config["COMPRESSION_BR_QUALITY"],
+    )
+    app.after_request(app.extensions["compressor"].process)
+
     # 添加请求日志中间件
     @app.before_request
     def log_request_info():
@@ -205,4 +524,15 @@ def create_app():
             if request.json:
                 current_app.logger.debug(f"Body: {request.json}")
 
+    # 启动时创建商品目录版本计数器行，读取版本号的请求不再写数据库；
+    # 表尚未创建时由 check_database_schema 建表后补建
+    from .changes import ensure_catalog_state
+
+    with app.app_context():
+        try:
+            ensure_catalog_state()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning(f"创建商品目录版本计数器失败: {str(e)}")
+
     return app
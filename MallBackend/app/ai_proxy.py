@@ -3,7 +3,9 @@ import json
 from flask import request, jsonify, Blueprint, current_app
 from openai import OpenAI
 from .models import AIMessage, Product
-from .auth import token_required
+from .auth import token_required, get_auth_context
+from .ratelimit import rate_limit
+from .search import load_products, search_index
 import jieba  # 用于中文分词
 from collections import Counter
 from typing import Set, Dict
@@ -108,6 +110,22 @@ for word in GENERAL_PRODUCT_KEYWORDS:
     jieba.add_word(word)
 
 
+def count_terms(text):
+    """从商品文本中提取关键词及其出现次数：分词结果（去除单字与停用词）及包含的类别词"""
+    counts = Counter(
+        kw for kw in jieba.lcut(text) if len(kw) >= 2 and kw not in STOP_WORDS
+    )
+    for category in product_categories:
+        if category not in counts and category in text:
+            counts[category] = text.count(category)
+    return counts
+
+
+def extract_terms(text):
+    """从商品文本中提取关键词集合"""
+    return set(count_terms(text))
+
+
 def load_all_product_keywords():
     """预加载所有商品的关键词"""
     try:
@@ -115,31 +133,10 @@ def load_all_product_keywords():
         current_app.logger.info(f"正在加载 {len(products)} 个商品的关键词...")
 
         for product in products:
-            keywords = set()
-
-            # 从商品名称中提取关键词
-            name_keywords = jieba.lcut(product.name)
-            keywords.update(
-                [kw for kw in name_keywords if len(kw) >= 2 and kw not in STOP_WORDS]
-            )
-
-            # 从商品描述中提取关键词
+            # 从商品名称和描述中提取关键词
+            keywords = extract_terms(product.name)
             if product.description:
-                desc_keywords = jieba.lcut(product.description)
-                keywords.update(
-                    [
-                        kw
-                        for kw in desc_keywords
-                        if len(kw) >= 2 and kw not in STOP_WORDS
-                    ]
-                )
-
-            # 添加商品类别关键词
-            for category in product_categories:
-                if category in product.name or (
-                    product.description and category in product.description
-                ):
-                    keywords.add(category)
+                keywords.update(extract_terms(product.description))
 
             # 添加价格相关关键词
             if product.price:
@@ -180,34 +177,15 @@ def extract_product_keywords(message):
 def search_products_by_keywords(keywords):
     """根据关键词动态搜索商品"""
     try:
-        from sqlalchemy import or_
-
         # 如果没有关键词，返回空列表
         if not keywords:
             return []
 
-        # 构建查询条件
-        conditions = []
-        for keyword in keywords:
-            # 对每个关键词，搜索名称和描述
-            conditions.append(Product.name.ilike(f"%{keyword}%"))
-            conditions.append(Product.description.ilike(f"%{keyword}%"))
-
-        # 执行查询
-        products = Product.query.filter(or_(*conditions)).all()
-
-        # 按关键词匹配度排序
-        def match_score(product):
-            score = 0
-            for keyword in keywords:
-                if keyword in product.name:
-                    score += 2  # 名称匹配权重更高
-                if product.description and keyword in product.description:
-                    score += 1  # 描述匹配权重较低
-            return score
-
-        products.sort(key=match_score, reverse=True)
-        return products[:10]  # 返回最多10个商品
+        # 通过倒排索引按 BM25 分数取前10个商品（名称匹配权重更高），再按主键读取
+        product_ids = search_index().rank(
+            {kw.lower() for kw in keywords}, k=10, require_all=False
+        )
+        return load_products(product_ids)
     except Exception as e:
         current_app.logger.error(f"商品搜索错误: {str(e)}")
         return []
@@ -371,6 +349,7 @@ def build_all_products_prompt(products):
 
 @ai_api.route("/chat", methods=["POST"])
 @token_required
+@rate_limit("AI_CHAT", lambda: get_auth_context().identity)
 def ai_chat_proxy(current_user=None):
     # 确保商品关键词已加载
     if not all_product_keywords:
@@ -0,0 +1,225 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+import brotli
+from flask import current_app, request
+from werkzeug.datastructures import ContentRange
+
+logger = logging.getLogger(__name__)
+
+# 预压缩的文本类文件扩展名，图片等已压缩格式不再压缩
+TEXT_EXTENSIONS = {".json", ".js", ".css", ".html", ".svg", ".txt", ".map"}
+
+# 内容编码 -> 预压缩文件后缀，按优先顺序排列
+ENCODINGS = {"br": "br", "gzip": "gz"}
+
+# 带内容哈希的URL内容永不变化；原URL需要用 ETag 重新验证
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+CHUNK_SIZE = 65536
+
+
+class Asset:
+    """静态文件及其内容哈希与预压缩版本"""
+
+    def __init__(self, name, path, digest, stat, variants):
+        self.name = name
+        self.path = path
+        self.digest = digest
+        self.stat = stat  # (mtime, 大小)，文件被替换时重新计算
+        self.variants = variants  # 内容编码 -> 预压缩文件路径
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    @property
+    def hashed_name(self):
+        """带内容哈希的文件名，如 hw.3fa9c2d1e0b4.png"""
+        stem, ext = os.path.splitext(self.name)
+        return f"{stem}.{self.digest}{ext}"
+
+
+class AssetManifest:
+    """静态文件清单
+
+    启动时为 static_dir 下的每个文件计算内容哈希，生成带哈希的文件名，并为
+    较大的文本文件预先生成 br/gzip 压缩版本（保存在 variant_dir，按内容哈希
+    命名，重启后直接复用）。文件被替换时按 mtime/大小检测并重新计算。
+    """
+
+    def __init__(self, static_dir, variant_dir, min_compress_size=1024):
+        self.static_dir = static_dir
+        self.variant_dir = variant_dir
+        self.min_compress_size = min_compress_size
+        self._lock = threading.Lock()
+        self._assets = {}  # 文件名 -> Asset
+        self._hashed = {}  # 带哈希的文件名 -> 文件名
+        self.built = False
+
+    def build(self):
+        """扫描静态目录，构建完成后原子替换"""
+        assets = {}
+        for root, _, files in os.walk(self.static_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.static_dir).replace(os.sep, "/")
+                assets[name] = self._fingerprint(name, path)
+        hashed = {asset.hashed_name: name for name, asset in assets.items()}
+        with self._lock:
+            self._assets, self._hashed = assets, hashed
+            self.built = True
+        logger.info(f"构建静态文件清单: {len(assets)} 个文件")
+
+    def ensure_built(self):
+        if not self.built:
+            self.build()
+
+    def _fingerprint(self, name, path):
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()[:12]
+        variants = {}
+        ext = os.path.splitext(name)[1].lower()
+        if ext in TEXT_EXTENSIONS and len(data) >= self.min_compress_size:
+            for encoding, suffix in ENCODINGS.items():
+                target = os.path.join(self.variant_dir, f"{digest}{ext}.{suffix}")
+                if not os.path.exists(target):
+                    body = _compress(data, encoding)
+                    if len(body) >= len(data):
+                        continue
+                    _write_atomic(target, body)
+                variants[encoding] = target
+        return Asset(name, path, digest, (stat.st_mtime_ns, stat.st_size), variants)
+
+    def resolve(self, filename):
+        """返回 (文件名, 是否为带哈希的URL)"""
+        self.ensure_built()
+        name = self._hashed.get(filename)
+        if name is not None:
+            return name, True
+        return filename, False
+
+    def get(self, name):
+        """文件名对应的 Asset，文件不在清单中时返回 None"""
+        self.ensure_built()
+        asset = self._assets.get(name)
+        if asset is None:
+            return None
+        try:
+            stat = os.stat(asset.path)
+        except FileNotFoundError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != asset.stat:
+            fresh = self._fingerprint(name, asset.path)
+            with self._lock:
+                self._assets[name] = fresh
+                # 旧的带哈希URL承诺内容永不变化，文件已替换后不再提供（返回404）
+                if self._hashed.get(asset.hashed_name) == name:
+                    del self._hashed[asset.hashed_name]
+                self._hashed[fresh.hashed_name] = name
+            asset = fresh
+        return asset
+
+    def url(self, name):
+        """文件的带哈希URL，不在清单中时返回原URL"""
+        asset = self.get(name)
+        return f"/static/{asset.hashed_name if asset else name}"
+
+    def urls(self):
+        """全部文件名 -> 带哈希URL"""
+        self.ensure_built()
+        return {name: self.url(name) for name in list(self._assets)}
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _write_atomic(target, body):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _negotiate(asset):
+    """按 Accept-Encoding 选择预压缩版本，返回内容编码（不压缩时为 None）"""
+    for encoding in ENCODINGS:
+        if encoding in asset.variants and request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def send_asset(asset, cache_control):
+    """发送静态文件，支持 ETag/304、预压缩版本与单区间 Range 请求
+
+    响应体使用服务器提供的 wsgi.file_wrapper，gunicorn 等服务器会从文件的
+    当前偏移处调用 sendfile 零拷贝发送，并且不超过 Content-Length（PEP 3333
+    的要求），因此 Range 请求只需先 seek 到起始位置。
+    """
+    encoding = _negotiate(asset)
+    path = asset.variants.get(encoding, asset.path)
+    # 不同编码的内容不同，强ETag也必须不同
+    etag = f"{asset.digest}-{encoding}" if encoding else asset.digest
+
+    response = current_app.response_class(
+        mimetype=asset.mimetype, direct_passthrough=True
+    )
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    response.accept_ranges = "bytes"
+    if encoding:
+        response.content_encoding = encoding
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+
+    size = os.path.getsize(path)
+    start, stop = 0, size
+    ranges = request.range
+    # If-Range 与当前 ETag 不一致时忽略 Range，返回完整内容；多区间也返回完整内容
+    if (
+        ranges is not None
+        and len(ranges.ranges) == 1
+        and request.headers.get("If-Range") in (None, f'"{etag}"')
+    ):
+        bounds = ranges.range_for_length(size)
+        if bounds is None:
+            response.status_code = 416
+            response.content_range = ContentRange("bytes", None, None, size)
+            return response
+        start, stop = bounds
+        response.status_code = 206
+        response.content_range = ContentRange("bytes", start, stop, size)
+
+    f = open(path, "rb")
+    f.seek(start)
+    response.call_on_close(f.close)
+    file_wrapper = request.environ.get("wsgi.file_wrapper")
+    if file_wrapper is not None:
+        response.response = file_wrapper(f, CHUNK_SIZE)
+    else:
+        response.response = _read_range(f, stop - start)
+    response.content_length = stop - start
+    return response
+
+
+def _read_range(f, length):
+    while length > 0:
+        chunk = f.read(min(CHUNK_SIZE, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
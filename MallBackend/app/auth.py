@@ -1,6 +1,6 @@
 # app/auth.py
 import re
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, g
 from flask_jwt_extended import (
     create_access_token,
     jwt_required,
@@ -8,47 +8,147 @@ from flask_jwt_extended import (
     get_jwt,
 )
 import functools
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
 from datetime import datetime
 from . import db
 from .models import User, TokenBlacklist, CartItem, AIMessage
+from .hashing import HasherBusy, hash_password, verify_password
+from .ratelimit import rate_limit
 
 auth_api = Blueprint("auth_api", __name__)
 
 
+def revoke_token(jti, exp_timestamp):
+    """将令牌加入黑名单（需由调用方提交事务）
+
+    返回过期时间，调用方在提交成功后应调用 remember_revoked() 更新进程内缓存。
+    """
+    expires_at = datetime.utcfromtimestamp(exp_timestamp)
+    db.session.add(TokenBlacklist(jti=jti, expires_at=expires_at))
+    return expires_at
+
+
+def revoke_by_version():
+    """是否使用用户令牌版本号方式撤销令牌"""
+    return current_app.config.get("TOKEN_REVOCATION_MODE") == "version"
+
+
+def remember_revoked(jti, expires_at):
+    """提交成功后同步更新进程内的已撤销令牌缓存"""
+    current_app.extensions["revocation_cache"].add(jti, expires_at)
+
+
+def load_user(user_id):
+    """按ID加载用户，优先使用进程内身份缓存
+
+    缓存中保存的是列值快照，命中时通过 merge(load=False) 重建一个绑定到
+    当前会话的实例，不产生SQL，且处理函数仍可正常修改或删除该用户。
+    """
+    cache = current_app.extensions["user_cache"]
+    values = cache.get(user_id)
+    if values is None:
+        user = User.query.get(user_id)
+        if user is not None:
+            cache.set(
+                user_id,
+                {
+                    attr.key: getattr(user, attr.key)
+                    for attr in inspect(User).column_attrs
+                },
+            )
+        return user
+
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate_user(user_id):
+    """用户记录被修改或删除后使缓存失效"""
+    current_app.extensions["user_cache"].invalidate(user_id)
+
+
+class AuthContext:
+    """请求级认证上下文
+
+    令牌在 jwt_required 中只解码一次，这里缓存解码后的声明，并在首次访问
+    user 时查询一次用户，同一请求内的重复访问不再产生任何开销。
+    """
+
+    _UNSET = object()
+
+    def __init__(self, claims):
+        self.claims = claims
+        self.jti = claims["jti"]
+        self.exp = claims["exp"]
+        self.identity = claims.get(current_app.config.get("JWT_IDENTITY_CLAIM", "sub"))
+        # 未携带版本号的旧令牌视为版本0
+        self.token_version = claims.get("ver", 0)
+        self._user = self._UNSET
+
+    @property
+    def user_id(self):
+        """用户ID (兼容字符串和整数)，格式无效时抛出 ValueError"""
+        if isinstance(self.identity, str):
+            return int(self.identity)
+        return self.identity
+
+    @property
+    def user(self):
+        if self._user is self._UNSET:
+            self._user = load_user(self.user_id)
+        return self._user
+
+
+def get_auth_context():
+    """获取当前请求的认证上下文（需在 jwt_required 之后调用）"""
+    claims = get_jwt()
+    ctx = g.get("auth_context")
+    # 应用上下文可能跨请求复用（如测试中），以本次请求解码出的声明为准
+    if ctx is None or ctx.claims is not claims:
+        ctx = AuthContext(claims)
+        g.auth_context = ctx
+    return ctx
+
+
 def token_required(fn):
     @jwt_required()
     @functools.wraps(fn)  # 使用 wraps 保留函数元数据
     def decorated_function(*args, **kwargs):
         try:
-            # 获取用户ID (兼容字符串和整数)
-            user_id = get_jwt_identity()
-            # 检查是否是字符串类型并转换
-            if isinstance(user_id, str):
-                try:
-                    user_id = int(user_id)
-                except (TypeError, ValueError):
-                    current_app.logger.error(f"无效的用户标识格式: {user_id}")
-                    return (
-                        jsonify({"status": "error", "error": "无效的用户标识格式"}),
-                        401,
-                    )
+            auth = get_auth_context()
+            # 检查用户ID格式
+            try:
+                user_id = auth.user_id
+            except (TypeError, ValueError):
+                current_app.logger.error(f"无效的用户标识格式: {auth.identity}")
+                return (
+                    jsonify({"status": "error", "error": "无效的用户标识格式"}),
+                    401,
+                )
 
             # 检查令牌是否在黑名单中
-            jti = get_jwt()["jti"]
-            token = TokenBlacklist.query.filter_by(jti=jti).first()
-            if token:
-                current_app.logger.warning(f"令牌已被加入黑名单: {jti}")
+            if current_app.extensions["revocation_cache"].is_revoked(auth.jti):
+                current_app.logger.warning(f"令牌已被加入黑名单: {auth.jti}")
                 return jsonify({"status": "error", "error": "令牌已失效"}), 401
 
-            current_user = User.query.get(user_id)
+            current_user = auth.user
             if not current_user:
                 current_app.logger.error(f"用户不存在: ID={user_id}")
                 return jsonify({"status": "error", "error": "无效的token"}), 401
 
+            # 令牌版本号与用户当前版本不一致说明已被整体撤销
+            if revoke_by_version() and auth.token_version != current_user.token_version:
+                current_app.logger.warning(f"令牌版本已失效: {auth.jti}")
+                return jsonify({"status": "error", "error": "令牌已失效"}), 401
+
             kwargs["current_user"] = current_user
             return fn(*args, **kwargs)
 
+        except HasherBusy:
+            # 交给应用的错误处理器返回503
+            raise
         except Exception as e:
             current_app.logger.error(f"令牌验证失败: {str(e)}", exc_info=True)
             return (
@@ -84,7 +184,7 @@ def register():
     if User.query.filter_by(username=username).first():
         return jsonify({"status": "error", "error": "用户名已存在"}), 400
 
-    new_user = User(username=username, password=generate_password_hash(password))
+    new_user = User(username=username, password=hash_password(password))
 
     db.session.add(new_user)
     db.session.commit()
@@ -97,18 +197,26 @@ def register():
     )
 
 
+def _login_username():
+    return (request.get_json(silent=True) or {}).get("username") or None
+
+
 @auth_api.route("/api/login", methods=["POST"])
+@rate_limit("LOGIN_IP", lambda: request.remote_addr)
+@rate_limit("LOGIN_USER", _login_username)
 def login():
     data = request.json
     username = data.get("username")
     password = data.get("password")
 
     user = User.query.filter_by(username=username).first()
-    if not user or not check_password_hash(user.password, password):
+    if not user or not verify_password(user.password, password):
         return jsonify({"status": "error", "error": "无效的用户名或密码"}), 401
 
-    # 将用户ID转换为字符串作为identity
-    access_token = create_access_token(identity=str(user.id))
+    # 将用户ID转换为字符串作为identity，并携带令牌版本号
+    access_token = create_access_token(
+        identity=str(user.id), additional_claims={"ver": user.token_version or 0}
+    )
 
     return (
         jsonify(
@@ -127,16 +235,12 @@ def login():
 @token_required
 def logout(current_user=None):  # 添加 current_user 参数
     try:
-        # 获取当前令牌的JTI (JWT ID)
-        jti = get_jwt()["jti"]
-        # 获取令牌的过期时间
-        exp_timestamp = get_jwt()["exp"]
-        expires_at = datetime.utcfromtimestamp(exp_timestamp)
-
-        # 将令牌加入黑名单
-        blacklisted_token = TokenBlacklist(jti=jti, expires_at=expires_at)
-        db.session.add(blacklisted_token)
+        auth = get_auth_context()
+
+        # 将当前令牌(JTI)加入黑名单
+        expires_at = revoke_token(auth.jti, auth.exp)
         db.session.commit()
+        remember_revoked(auth.jti, expires_at)
 
         return jsonify({"status": "success", "message": "退出成功"}), 200
     except Exception as e:
@@ -174,7 +278,7 @@ def change_password(current_user=None):
         return jsonify({"status": "error", "error": "原密码和新密码不能为空"}), 400
 
     # 验证原密码
-    if not check_password_hash(current_user.password, old_password):
+    if not verify_password(current_user.password, old_password):
         return jsonify({"status": "error", "error": "原密码错误"}), 400
 
     # 验证新密码长度
@@ -185,17 +289,21 @@ def change_password(current_user=None):
         )
 
     # 更新密码
-    current_user.password = generate_password_hash(new_password)
-    db.session.commit()
-
-    # 将当前token加入黑名单，强制重新登录
-    jti = get_jwt()["jti"]
-    exp_timestamp = get_jwt()["exp"]
-    expires_at = datetime.utcfromtimestamp(exp_timestamp)
+    current_user.password = hash_password(new_password)
 
-    blacklisted_token = TokenBlacklist(jti=jti, expires_at=expires_at)
-    db.session.add(blacklisted_token)
+    if revoke_by_version():
+        # 递增令牌版本号，使该用户已签发的所有令牌失效；current_user 可能来自
+        # 身份缓存，版本号已落后于数据库，因此在SQL中递增
+        current_user.token_version = User.token_version + 1
     db.session.commit()
+    invalidate_user(current_user.id)
+
+    if not revoke_by_version():
+        # 将当前token加入黑名单，强制重新登录
+        auth = get_auth_context()
+        expires_at = revoke_token(auth.jti, auth.exp)
+        db.session.commit()
+        remember_revoked(auth.jti, expires_at)
 
     return jsonify({"status": "success", "message": "密码修改成功，请重新登录"}), 200
 
@@ -211,23 +319,25 @@ def delete_account(current_user=None):
         return jsonify({"status": "error", "error": "需要密码确认"}), 400
 
     # 验证密码
-    if not check_password_hash(current_user.password, password):
+    if not verify_password(current_user.password, password):
         return jsonify({"status": "error", "error": "密码错误"}), 400
 
-    # 将当前token加入黑名单
-    jti = get_jwt()["jti"]
-    exp_timestamp = get_jwt()["exp"]
-    expires_at = datetime.utcfromtimestamp(exp_timestamp)
-
-    blacklisted_token = TokenBlacklist(jti=jti, expires_at=expires_at)
-    db.session.add(blacklisted_token)
+    # 将当前token加入黑名单（版本号模式下用户删除后令牌自然失效，无需写黑名单）
+    auth = get_auth_context()
+    expires_at = None
+    if not revoke_by_version():
+        expires_at = revoke_token(auth.jti, auth.exp)
 
     # 删除用户的所有相关数据
     CartItem.query.filter_by(user_id=current_user.id).delete()
     AIMessage.query.filter_by(user_id=current_user.id).delete()
 
     # 删除用户
+    user_id = current_user.id
     db.session.delete(current_user)
     db.session.commit()
+    invalidate_user(user_id)
+    if expires_at is not None:
+        remember_revoked(auth.jti, expires_at)
 
     return jsonify({"status": "success", "message": "账户已成功删除"}), 200
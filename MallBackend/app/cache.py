@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class RevokedTokenCache:
+    """进程内已撤销令牌(JTI)缓存
+
+    每个 worker 持有一份 JTI -> 过期时间戳 的集合，首次使用时从
+    token_blacklist 全量加载，之后每隔 sync_interval 秒增量同步其他 worker
+    写入的黑名单记录。本 worker 的撤销操作通过 add() 立即生效，
+    因此"未撤销"这一最常见的情况不需要访问数据库。
+
+    自增ID与 created_at 都不保证按提交顺序出现（先分配的记录可能后提交），
+    因此增量同步按 created_at 重新读取最近 sync_margin 秒内的记录，只要
+    事务在 sync_margin 内提交就不会遗漏。
+    """
+
+    def __init__(self, sync_interval=10, sync_margin=60):
+        self.sync_interval = sync_interval
+        self.sync_margin = sync_margin
+        self._lock = threading.Lock()
+        self._revoked = {}  # jti -> 过期时间戳(UTC)
+        self._watermark = None  # 已同步记录的最大 created_at（数据库时钟）
+        self._last_sync = 0.0
+        self._loaded = False
+
+    def _sync(self):
+        """从数据库增量同步黑名单记录（需要应用上下文）"""
+        from .models import TokenBlacklist
+
+        now = datetime.utcnow()
+        query = TokenBlacklist.query.with_entities(
+            TokenBlacklist.jti, TokenBlacklist.expires_at, TokenBlacklist.created_at
+        ).filter(TokenBlacklist.expires_at >= now)
+        if self._watermark is not None:
+            query = query.filter(
+                TokenBlacklist.created_at
+                >= self._watermark - timedelta(seconds=self.sync_margin)
+            )
+        added = 0
+        for jti, expires_at, created_at in query.all():
+            if jti not in self._revoked:
+                added += 1
+            self._revoked[jti] = _to_timestamp(expires_at)
+            if self._watermark is None or created_at > self._watermark:
+                self._watermark = created_at
+
+        # 顺便清理已过期的条目，过期令牌本身会被JWT校验拒绝
+        now_ts = time.time()
+        for jti in [j for j, exp in self._revoked.items() if exp < now_ts]:
+            del self._revoked[jti]
+
+        self._loaded = True
+        self._last_sync = time.monotonic()
+        if added:
+            logger.info(f"同步了 {added} 个已撤销令牌")
+
+    def _maybe_sync(self):
+        if self._loaded and time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        with self._lock:
+            # 双重检查，避免并发请求重复同步
+            if (
+                not self._loaded
+                or time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+
+    def load(self):
+        """全量加载黑名单（启动时调用）"""
+        with self._lock:
+            self._revoked.clear()
+            self._watermark = None
+            self._loaded = False
+            self._sync()
+
+    def is_revoked(self, jti):
+        """检查JTI是否已被撤销"""
+        try:
+            self._maybe_sync()
+        except Exception as e:
+            logger.error(f"同步令牌黑名单失败: {str(e)}")
+            if not self._loaded:
+                # 缓存尚不可用时回退到直接查询数据库，保证撤销语义
+                from .models import TokenBlacklist
+
+                return TokenBlacklist.query.filter_by(jti=jti).first() is not None
+        return jti in self._revoked
+
+    def add(self, jti, expires_at):
+        """记录本 worker 刚撤销的令牌"""
+        with self._lock:
+            self._revoked[jti] = _to_timestamp(expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._watermark = None
+            self._loaded = False
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+class TTLCache:
+    """带过期时间的有界LRU缓存（线程安全），记录命中/未命中次数"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (过期时刻, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key, default=None):
+        """读取但不计入命中统计、不调整LRU顺序"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                return default
+            return item[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _to_timestamp(value):
+    """将 UTC datetime 或时间戳统一转换为时间戳"""
+    if isinstance(value, datetime):
+        return (value - datetime(1970, 1, 1)).total_seconds()
+    return float(value)
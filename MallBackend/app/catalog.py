@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from flask import current_app
+from .fields import DETAIL_FIELDS, PRODUCT_FIELDS, load_columns
+from .http_cache import make_etag
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# 商品详情缓存的填充与失效检查
+_detail_lock = threading.Lock()
+
+
+def serialize_product(product, fields=None):
+    """商品列表中使用的商品字段，fields 为字段子集（None 表示全部）"""
+    if fields is None:
+        fields = PRODUCT_FIELDS
+    return {name: getattr(product, name) for name in fields}
+
+
+def serialize_product_detail(product, fields=None):
+    """商品详情字段，images 解析为列表（至少包含主图）"""
+    if fields is None:
+        fields = DETAIL_FIELDS
+    data = serialize_product(product, [f for f in fields if f != "images"])
+    if "images" in fields:
+        try:
+            # 解析图片列表
+            images = json.loads(product.images) if product.images else []
+        except ValueError:
+            images = []
+
+        # 确保至少有一张主图
+        if not images and product.image:
+            images = [product.image]
+        data["images"] = images  # 返回多张图片列表
+    return data
+
+
+def encode_product_detail(product, fields=None, fmt="json"):
+    """编码商品详情响应，返回 (响应体字节, ETag)
+
+    商品每次修改都会分配新的版本号，版本未变化时内容不变。
+    """
+    payload = serialize_product_detail(product, fields)
+    body = current_app.json.encode(payload, fmt)
+    return body, make_etag("detail", product.id, product.version, fields, fmt)
+
+
+def product_detail(product_id, fields=None, fmt="json"):
+    """商品详情的 (响应体字节, ETag)，商品不存在时返回 None
+
+    编码结果按商品ID缓存（同一商品的不同字段子集与响应格式保存在一起），
+    命中时不访问数据库也不做编码；本 worker 修改/删除商品时失效，其他
+    worker 的修改在缓存过期后生效。
+
+    未命中时先放入（或沿用）该商品的字典再读取数据库，编码后只有字典仍在
+    缓存中才写入：读取期间商品被修改并失效时丢弃结果，不会把旧内容缓存
+    整个 TTL。
+    """
+    cache = current_app.extensions["product_detail_cache"]
+    key = (fields, fmt)
+    with _detail_lock:
+        variants = cache.get(product_id)
+        if variants is None:
+            variants = {}
+            cache.set(product_id, variants)
+    entry = variants.get(key)
+    if entry is not None:
+        return entry
+
+    query = Product.query
+    columns = load_columns(Product, fields, "version")
+    if columns is not None:
+        query = query.options(columns)
+    product = query.filter_by(id=product_id).first()
+    if product is None:
+        with _detail_lock:
+            if cache.peek(product_id) is variants and not variants:
+                cache.invalidate(product_id)
+        return None
+    entry = encode_product_detail(product, fields, fmt)
+    with _detail_lock:
+        if cache.peek(product_id) is variants:
+            variants[key] = entry
+    return entry
+
+
+def warm_product_details():
+    """启动时预先编码商品详情（最多缓存容量个），返回数量（需要应用上下文）"""
+    cache = current_app.extensions["product_detail_cache"]
+    count = 0
+    for product in Product.query.order_by(Product.id).limit(cache.maxsize):
+        cache.set(product.id, {(None, "json"): encode_product_detail(product)})
+        count += 1
+    logger.info(f"预先编码了 {count} 个商品详情")
+    return count
+
+
+class CatalogSnapshot:
+    """某一版本商品目录的只读快照，商品按ID排序"""
+
+    def __init__(self, version, products):
+        self.version = version
+        self.products = products
+        self.by_id = {p["id"]: p for p in products}
+        # 商品ID列表的摘要：只随商品增删变化，各 worker 相同，供翻页游标使用
+        self.digest = hashlib.sha1(
+            "\x1f".join(p["id"] for p in products).encode()
+        ).hexdigest()[:16]
+        self.built_at = time.monotonic()
+
+    def sample(self, k):
+        """随机抽取k个不同商品，O(k)"""
+        return random.sample(self.products, min(k, len(self.products)))
+
+    def __len__(self):
+        return len(self.products)
+
+
+class Catalog:
+    """进程内商品目录
+
+    商品创建/更新/删除后调用 invalidate()，下次读取时重建快照并递增版本号；
+    其他 worker 的修改在快照超过 max_age 秒后被重新加载。
+    商品数量超过 max_items 时不在内存中保存快照，改为按主键随机区间在数据库中抽样：
+    重建时每隔 stride 个ID记录一个分段起点，抽样时随机选分段和段内偏移，
+    每次抽取最多扫描 stride 条索引记录。
+    """
+
+    def __init__(self, max_items=50000, max_age=30, stride=100):
+        self.max_items = max_items
+        self.max_age = max_age
+        self.stride = stride
+        self.version = 0
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._fences = None  # 目录过大时的主键分段起点
+        self._built_at = None
+        self._dirty = True
+
+    def invalidate(self):
+        """商品数据发生变化"""
+        with self._lock:
+            self._dirty = True
+
+    def _is_stale(self):
+        return (
+            self._dirty
+            or self._built_at is None
+            or time.monotonic() - self._built_at > self.max_age
+        )
+
+    def _rebuild(self):
+        self.version += 1
+        count = Product.query.count()
+        if count > self.max_items:
+            ids = Product.query.with_entities(Product.id).order_by(Product.id)
+            self._fences = [
+                row.id
+                for i, row in enumerate(ids.yield_per(10000))
+                if i % self.stride == 0
+            ]
+            self._snapshot = None
+            logger.info(f"商品目录过大({count})，使用数据库抽样，版本 {self.version}")
+        else:
+            products = Product.query.order_by(Product.id).all()
+            self._snapshot = CatalogSnapshot(
+                self.version, [serialize_product(p) for p in products]
+            )
+            self._fences = None
+            logger.info(f"重建商品目录快照: {count} 个商品，版本 {self.version}")
+        self._built_at = time.monotonic()
+        self._dirty = False
+
+    def refresh(self):
+        """必要时重建快照（需要应用上下文）"""
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._rebuild()
+
+    def snapshot(self):
+        """当前快照；目录过大时返回 None"""
+        self.refresh()
+        return self._snapshot
+
+    def random_products(self, k):
+        """随机抽取k个不同商品"""
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            return snapshot.sample(k)
+        return self._sample_from_db(k)
+
+    def _sample_from_db(self, k):
+        fences = self._fences or []
+        selected = {}
+        for _ in range(k * 4):
+            if len(selected) >= k or not fences:
+                break
+            product = (
+                Product.query.filter(Product.id >= random.choice(fences))
+                .order_by(Product.id)
+                .offset(random.randrange(self.stride))
+                .limit(1)
+                .first()
+            )
+            if product is not None:
+                selected.setdefault(product.id, serialize_product(product))
+        return list(selected.values())
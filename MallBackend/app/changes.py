@@ -0,0 +1,188 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .catalog import serialize_product
+from .models import CatalogState, Product, ProductTombstone
+
+logger = logging.getLogger(__name__)
+
+
+def _catalog_state(lock=False):
+    """读取计数器行，不存在时返回 None（只读，不插入）"""
+    return db.session.get(
+        CatalogState,
+        1,
+        populate_existing=True,
+        with_for_update=True if lock else None,
+    )
+
+
+def ensure_catalog_state():
+    """创建计数器行并提交（启动时调用），已存在时不做任何事
+
+    多个 worker 同时启动时可能并发插入，主键冲突说明已由其他 worker 创建。
+    """
+    if _catalog_state() is not None:
+        return
+    try:
+        db.session.add(CatalogState(id=1, version=0, pruned_version=0))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+
+def _locked_catalog_state():
+    """对计数器行加行锁后返回；启动时未能创建（如表当时还不存在）时在保存点中补建"""
+    state = _catalog_state(lock=True)
+    if state is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(CatalogState(id=1, version=0, pruned_version=0))
+        except IntegrityError:
+            pass
+        state = _catalog_state(lock=True)
+    return state
+
+
+def current_catalog_version():
+    """当前目录版本号，计数器行尚未创建时为0"""
+    state = _catalog_state()
+    return state.version if state is not None else 0
+
+
+def next_catalog_version():
+    """在当前事务中递增并返回目录版本号
+
+    对计数器行加行锁，并发修改商品的事务按提交顺序获得递增的版本号。
+    """
+    state = _locked_catalog_state()
+    state.version += 1
+    return state.version
+
+
+def mark_product_changed(product):
+    """商品创建或修改：分配新版本号，并移除同ID的删除记录（需在提交前调用）"""
+    product.version = next_catalog_version()
+    ProductTombstone.query.filter_by(product_id=product.id).delete()
+
+
+def mark_product_deleted(product_id):
+    """商品删除：写入（或更新）删除记录（需在提交前调用）"""
+    version = next_catalog_version()
+    tombstone = ProductTombstone.query.get(product_id)
+    if tombstone is None:
+        db.session.add(ProductTombstone(product_id=product_id, version=version))
+    else:
+        tombstone.version = version
+        tombstone.deleted_at = datetime.utcnow()
+
+
+def catalog_changes(since, limit, after=None, snapshot=None):
+    """返回 since 之后的商品变更
+
+    since 为0或早于已清理的删除记录时按商品ID分页返回全部商品(full=True)：
+    has_more 为真时客户端以 since=0、after=返回的 after、snapshot=返回的
+    version 继续请求，全部取完后以该 version 开始增量同步（分页期间的修改
+    版本号都大于它，会在增量同步中再次返回）。否则按版本号顺序返回最多
+    limit 条新增/修改的商品与删除的商品ID；has_more 为真时客户端应以返回的
+    version 继续请求。
+    """
+    state = _catalog_state()
+    current = state.version if state is not None else 0
+    pruned = state.pruned_version if state is not None else 0
+    if since <= 0 or since < pruned:
+        query = Product.query.order_by(Product.id)
+        if after is not None:
+            query = query.filter(Product.id > after)
+        products = query.limit(limit + 1).all()
+        has_more = len(products) > limit
+        products = products[:limit]
+        page = {
+            "version": snapshot if snapshot is not None else current,
+            "full": True,
+            "products": [_change(p) for p in products],
+            "deleted": [],
+            "has_more": has_more,
+        }
+        if has_more:
+            page["after"] = products[-1].id
+        return page
+
+    products = (
+        Product.query.filter(Product.version > since)
+        .order_by(Product.version)
+        .limit(limit + 1)
+        .all()
+    )
+    tombstones = (
+        ProductTombstone.query.filter(ProductTombstone.version > since)
+        .order_by(ProductTombstone.version)
+        .limit(limit + 1)
+        .all()
+    )
+    changes = sorted(
+        [(p.version, p) for p in products] + [(t.version, t) for t in tombstones],
+        key=lambda item: item[0],
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    version = changes[-1][0] if has_more else max(current, since)
+    return {
+        "version": version,
+        "full": False,
+        "products": [_change(c) for _, c in changes if isinstance(c, Product)],
+        "deleted": [
+            c.product_id for _, c in changes if isinstance(c, ProductTombstone)
+        ],
+        "has_more": has_more,
+    }
+
+
+def product_changes_since(since, limit):
+    """返回 since 之后修改的商品对象与删除的商品ID (products, deleted)
+
+    since 早于已清理的删除记录，或变更超过 limit 条时返回 None，调用方
+    应改为全量重建。
+    """
+    state = _catalog_state()
+    if state is not None and since < state.pruned_version:
+        return None
+    products = Product.query.filter(Product.version > since).limit(limit + 1).all()
+    deleted = [
+        row.product_id
+        for row in ProductTombstone.query.with_entities(ProductTombstone.product_id)
+        .filter(ProductTombstone.version > since)
+        .limit(limit + 1)
+    ]
+    if len(products) + len(deleted) > limit:
+        return None
+    return products, deleted
+
+
+def _change(product):
+    data = serialize_product(product)
+    data["version"] = product.version
+    return data
+
+
+def prune_tombstones(retention_days):
+    """清理超过保留期的删除记录，并记录已清理的最大版本号（需要应用上下文）"""
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        expired = ProductTombstone.query.filter(ProductTombstone.deleted_at < cutoff)
+        max_version = expired.with_entities(
+            db.func.max(ProductTombstone.version)
+        ).scalar()
+        if max_version is None:
+            return 0
+        state = _locked_catalog_state()
+        state.pruned_version = max(state.pruned_version, max_version)
+        deleted = expired.delete(synchronize_session=False)
+        db.session.commit()
+        logger.info(f"清理了 {deleted} 条过期的商品删除记录")
+        return deleted
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"清理商品删除记录失败: {str(e)}")
+        return 0
@@ -0,0 +1,156 @@
+import threading
+import time
+import zlib
+import brotli
+from flask import request
+
+# 支持的内容编码，按优先顺序排列
+ENCODINGS = ("br", "gzip")
+
+# 可压缩的内容类型；图片等已压缩格式不再压缩
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/msgpack",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+
+class _Encoder:
+    """流式压缩器，统一 zlib 与 brotli 的接口"""
+
+    def __init__(self, encoding, gzip_level, br_quality):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=br_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # gzip 格式
+
+    def compress(self, data, flush=False):
+        """压缩一段数据；flush 为真时立即输出已压缩的内容（流式响应逐块发送）"""
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class ResponseCompressor:
+    """按 Accept-Encoding 压缩响应体（br 优先，其次 gzip）
+
+    作为 after_request 钩子使用：只压缩 JSON/文本等可压缩类型且不小于
+    min_size 字节的响应；已设置 Content-Encoding 的响应（如预压缩的静态
+    文件）、文件响应(direct_passthrough)、206/304 等不处理。流式响应逐块
+    压缩并立即发送。压缩后的强ETag加上编码后缀，与未压缩版本区分。
+
+    每个端点统计压缩前后的字节数与压缩耗用的CPU时间。
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, br_quality=4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.br_quality = br_quality
+        self._lock = threading.Lock()
+        self._stats = {}  # 端点 -> [响应数, 压缩前字节, 压缩后字节, CPU秒]
+
+    def _negotiate(self):
+        accept = request.accept_encodings
+        for encoding in ENCODINGS:
+            if accept[encoding] > 0:
+                return encoding
+        return None
+
+    def _compressible(self, response):
+        mimetype = response.mimetype or ""
+        return (
+            200 <= response.status_code < 300
+            and response.status_code not in (204, 206)
+            and request.method != "HEAD"
+            and not response.direct_passthrough
+            and "Content-Encoding" not in response.headers
+            and "no-transform" not in response.headers.get("Cache-Control", "")
+            and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES)
+        )
+
+    def process(self, response):
+        if not self._compressible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self._negotiate()
+        if encoding is None:
+            return response
+        length = response.content_length
+        if length is not None and length < self.min_size:
+            return response
+
+        endpoint = request.endpoint or "<unknown>"
+        encoder = _Encoder(encoding, self.gzip_level, self.br_quality)
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoder, endpoint)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            start = time.thread_time()
+            data = encoder.compress(body) + encoder.finish()
+            self._record(endpoint, len(body), len(data), time.thread_time() - start)
+            response.set_data(data)
+
+        response.content_encoding = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f"{etag}-{encoding}")
+        return response
+
+    def _stream(self, chunks, encoder, endpoint):
+        size_in = size_out = 0
+        cpu = 0.0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                start = time.thread_time()
+                data = encoder.compress(chunk, flush=True)
+                cpu += time.thread_time() - start
+                size_in += len(chunk)
+                size_out += len(data)
+                if data:
+                    yield data
+            start = time.thread_time()
+            data = encoder.finish()
+            cpu += time.thread_time() - start
+            size_out += len(data)
+            yield data
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            self._record(endpoint, size_in, size_out, cpu)
+
+    def _record(self, endpoint, size_in, size_out, cpu):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, [0, 0, 0, 0.0])
+            stats[0] += 1
+            stats[1] += size_in
+            stats[2] += size_out
+            stats[3] += cpu
+
+    def stats(self):
+        """各端点的压缩次数、压缩率（压缩后/压缩前）与平均CPU耗时(ms)"""
+        with self._lock:
+            return {
+                endpoint: {
+                    "responses": count,
+                    "bytes_in": size_in,
+                    "bytes_out": size_out,
+                    "ratio": round(size_out / size_in, 4) if size_in else None,
+                    "cpu_ms_per_response": round(cpu * 1000 / count, 3),
+                }
+                for endpoint, (count, size_in, size_out, cpu) in self._stats.items()
+            }
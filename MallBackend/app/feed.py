@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import random
+import secrets
+import threading
+import time
+from datetime import timedelta
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import func
+
+logger = logging.getLogger(__name__)
+
+FEED_CURSOR_SALT = "product-feed"
+_FEISTEL_ROUNDS = 4
+
+
+def permuted_index(index, size, seed):
+    """把 [0, size) 中的 index 映射为伪随机排列中的位置
+
+    使用以 seed 为密钥的 Feistel 网络在 2 的幂大小的域上构造双射，超出 size
+    的结果继续迭代(cycle walking)直到落回范围内，因此只需保存 seed 即可表示
+    整个排列，每次映射 O(1)，无需打乱或扫描整个目录。
+    """
+    half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+    mask = (1 << half_bits) - 1
+    value = index
+    while True:
+        left, right = value >> half_bits, value & mask
+        for round_no in range(_FEISTEL_ROUNDS):
+            digest = hashlib.blake2b(
+                f"{seed}:{round_no}:{right}".encode(), digest_size=8
+            ).digest()
+            left, right = right, left ^ (int.from_bytes(digest, "big") & mask)
+        value = (left << half_bits) | right
+        if value < size:
+            return value
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt=FEED_CURSOR_SALT)
+
+
+def _load_cursor(token, digest):
+    """解析游标，签名无效或商品集合已变化时返回 None"""
+    if not token:
+        return None
+    try:
+        data = _serializer().loads(token)
+    except BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get("v") != digest:
+        return None
+    return data
+
+
+def rotation_page(snapshot, token, k):
+    """按游标返回下一页商品与新的游标
+
+    每个客户端持有一个签名游标 {v: 商品ID列表摘要, s: 排列种子, p: 位置}，
+    依次翻阅该排列，排列用完前不会出现重复商品；用完或商品增删后开始新的排列。
+    摘要只取决于商品集合，快照定期重建或请求落到其他 worker 时游标仍然有效。
+    """
+    size = len(snapshot)
+    cursor = _load_cursor(token, snapshot.digest)
+    if cursor is None or cursor["p"] + k > size:
+        cursor = {"v": snapshot.digest, "s": secrets.randbits(32), "p": 0}
+
+    start = cursor["p"]
+    products = [
+        snapshot.products[permuted_index(i, size, cursor["s"])]
+        for i in range(start, min(start + k, size))
+    ]
+    cursor["p"] = start + len(products)
+    return products, _serializer().dumps(cursor)
+
+
+def build_alias_table(weights):
+    """Vose 别名法：O(n) 构建，之后每次按权重抽样 O(1)"""
+    n = len(weights)
+    total = float(sum(weights))
+    scaled = [w * n / total for w in weights]
+    prob = [0.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s, g = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = g
+        scaled[g] = scaled[g] + scaled[s] - 1.0
+        (small if scaled[g] < 1.0 else large).append(g)
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+
+class PopularityFeed:
+    """按加购热度加权的商品流
+
+    热度 = 加购数量按时间指数衰减(半衰期 half_life_hours)后的累计值，每个商品另有
+    base_weight 的基础权重，保证新商品也有曝光机会。refresh() 由后台任务定期
+    调用：首次以及每 full_every 次读取全部 cart_items，其余只读取上次水位之后
+    更新的记录，并对已有热度整体衰减；每条购物车记录保存上次看到的数量，
+    只累加增加的部分（全量读取时重建该表，已删除的记录随之移除）。然后重建
+    别名表并原子替换；请求路径上只做 O(1) 抽样。时间统一使用数据库时钟，与
+    cart_items.updated_at 一致。
+    """
+
+    def __init__(self, half_life_hours=72, base_weight=1.0, full_every=12):
+        self.half_life_hours = half_life_hours
+        self.base_weight = base_weight
+        self.full_every = full_every
+        self.scores = {}  # 商品ID -> 衰减后的热度
+        self._quantities = {}  # 购物车记录ID -> 上次看到的数量
+        self._watermark = None  # 已处理的 cart_items.updated_at 最大值
+        self._refreshed_at = None  # 上次刷新时的数据库时间
+        self._refreshes = 0
+        self._table = None  # (商品ID列表, 概率表, 别名表)
+        self._lock = threading.Lock()
+
+    def _decay(self, age):
+        hours = max(age.total_seconds(), 0) / 3600
+        return 0.5 ** (hours / self.half_life_hours)
+
+    def refresh(self, product_ids):
+        """增量更新热度并重建别名表（需要应用上下文）"""
+        from . import db
+        from .models import CartItem
+
+        with self._lock:
+            now = db.session.query(func.current_timestamp()).scalar()
+            query = db.session.query(
+                CartItem.id, CartItem.product_id, CartItem.quantity, CartItem.updated_at
+            )
+            full = self._watermark is None or self._refreshes % self.full_every == 0
+            if self._watermark is not None:
+                if not full:
+                    # 与水位同一秒内可能还有未读到的记录，重新读取水位前1秒以来的
+                    # 记录，数量未变的记录不会重复累加
+                    query = query.filter(
+                        CartItem.updated_at >= self._watermark - timedelta(seconds=1)
+                    )
+                factor = self._decay(now - self._refreshed_at)
+                for product_id in self.scores:
+                    self.scores[product_id] *= factor
+            rows = query.all()
+
+            seen = self._quantities
+            quantities = {} if full else seen
+            for item_id, product_id, quantity, updated_at in rows:
+                quantity = quantity or 0
+                added = quantity - seen.get(item_id, 0)
+                quantities[item_id] = quantity
+                if added > 0:
+                    weight = self._decay(now - updated_at) if updated_at else 1.0
+                    self.scores[product_id] = (
+                        self.scores.get(product_id, 0.0) + added * weight
+                    )
+                if updated_at and (
+                    self._watermark is None or updated_at > self._watermark
+                ):
+                    self._watermark = updated_at
+            self._quantities = quantities
+            if self._watermark is None:
+                self._watermark = now
+            self._refreshed_at = now
+            self._refreshes += 1
+
+            ids = list(product_ids)
+            if ids:
+                weights = [self.base_weight + self.scores.get(i, 0.0) for i in ids]
+                prob, alias = build_alias_table(weights)
+                self._table = (ids, prob, alias)
+            else:
+                self._table = None
+            logger.info(f"重建热度别名表: {len(ids)} 个商品，{len(rows)} 条加购记录")
+
+    @property
+    def ready(self):
+        return self._table is not None
+
+    def sample(self, k, snapshot):
+        """按热度抽取k个不同商品；别名表中已不存在于快照的商品会被跳过"""
+        ids, prob, alias = self._table
+        n = len(ids)
+        selected = {}
+        for _ in range(k * 20):
+            if len(selected) >= k:
+                break
+            i = random.randrange(n)
+            if random.random() >= prob[i]:
+                i = alias[i]
+            product = snapshot.by_id.get(ids[i])
+            if product is not None:
+                selected.setdefault(product["id"], product)
+        # 权重过于集中时用均匀抽样补足
+        for product in snapshot.sample(k):
+            if len(selected) >= min(k, len(snapshot)):
+                break
+            selected.setdefault(product["id"], product)
+        return list(selected.values())
+
+
+def refresh_popularity_feed():
+    """后台任务：刷新热度商品流（需要应用上下文）"""
+    try:
+        snapshot = current_app.extensions["catalog"].snapshot()
+        feed = current_app.extensions["popularity_feed"]
+        if snapshot is not None:
+            product_ids = [p["id"] for p in snapshot.products]
+        else:
+            # 目录过大时只对有加购记录的商品加权
+            product_ids = list(feed.scores)
+        feed.refresh(product_ids)
+    except Exception as e:
+        logger.error(f"刷新热度商品流失败: {str(e)}")
+
+
+def start_popularity_refresher(app):
+    """启动后台线程，按 POPULARITY_REFRESH_INTERVAL 定期刷新热度商品流
+
+    供没有 run.py 调度器的部署方式（wsgi.py）使用，启动后立即刷新一次；
+    刷新完成前热度商品流请求退回默认商品流。
+    """
+
+    def run():
+        while True:
+            with app.app_context():
+                refresh_popularity_feed()
+            time.sleep(app.config["POPULARITY_REFRESH_INTERVAL"])
+
+    thread = threading.Thread(target=run, name="popularity-refresh", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,71 @@
+from sqlalchemy.orm import load_only
+
+# 各接口可通过 fields 参数选择的字段，输出时按此顺序排列
+PRODUCT_FIELDS = ("id", "name", "price", "image", "description")
+DETAIL_FIELDS = PRODUCT_FIELDS + ("images",)
+CART_FIELDS = ("id", "product", "quantity", "updated_at") + tuple(
+    f"product.{name}" for name in PRODUCT_FIELDS
+)
+MESSAGE_FIELDS = ("id", "role", "content", "timestamp")
+
+# 输出字段 -> 需要从数据库加载的列（默认同名）
+COLUMNS = {"images": ("image", "images"), "product": ()}
+
+
+def parse_fields(args, allowed):
+    """解析 fields 参数（逗号分隔），返回按 allowed 顺序排列的字段元组
+
+    未指定时返回 None（全部字段）；包含不支持的字段时抛出 ValueError（消息
+    可直接返回给客户端）。
+    """
+    value = args.get("fields", "")
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    if not requested:
+        return None
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"不支持的字段: {','.join(sorted(unknown))}")
+    return tuple(name for name in allowed if name in requested)
+
+
+def pick(data, fields):
+    """保留字典中的指定字段，fields 为 None 时原样返回"""
+    if fields is None:
+        return data
+    return {name: data[name] for name in fields}
+
+
+def load_columns(model, fields, *required):
+    """只加载输出所需的列（主键总会加载）；fields 为 None 时返回 None
+
+    required 为查询本身需要的列，如排序与游标使用的列。
+    """
+    if fields is None:
+        return None
+    names = dict.fromkeys(required)
+    for name in fields:
+        names.update(dict.fromkeys(COLUMNS.get(name, (name,))))
+    return load_only(*(getattr(model, name) for name in names))
+
+
+def cart_fields(fields):
+    """拆分购物车字段为 (购物车项字段, 商品字段)
+
+    指定 product 时返回商品全部字段，只指定 product.xxx 时返回其中的字段；
+    两者都未指定时商品字段为空元组。fields 为 None 时均返回 None。
+    """
+    if fields is None:
+        return None, None
+    if "product" in fields:
+        product_fields = PRODUCT_FIELDS
+    else:
+        product_fields = tuple(
+            name[len("product.") :] for name in fields if name.startswith("product.")
+        )
+    item_fields = tuple(
+        name
+        for name in CART_FIELDS
+        if "." not in name
+        and (name in fields or (name == "product" and product_fields))
+    )
+    return item_fields, product_fields
@@ -0,0 +1,140 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusy(ServiceUnavailable):
+    """密码哈希队列已满或超时"""
+
+    description = "服务繁忙，请稍后重试"
+
+    def __init__(self, retry_after=1):
+        super().__init__()
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """密码哈希进程池
+
+    scrypt/pbkdf2 等KDF计算是CPU密集型且持有GIL，放到独立的进程池中执行，
+    避免登录高峰时拖慢同一 worker 内的其他请求。排队中的任务数受
+    max_pending 限制，队列满时立即抛出 HasherBusy，由调用方返回503；超时的
+    任务无法中止，其名额在任务实际结束后才释放。
+    workers 为0时在当前线程内计算（仍受队列上限约束）。
+
+    start() 在启动时创建进程池并立即 fork 出全部子进程，此时服务线程尚未
+    启动；子进程异常退出导致进程池损坏(BrokenProcessPool)时重建进程池。
+    在其他进程（如 gunicorn --preload 后的 worker）中使用时同样重建。
+    """
+
+    def __init__(self, workers=2, max_pending=32, timeout=10, retry_after=1):
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None  # 创建进程池的进程
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def start(self):
+        """创建进程池并启动全部子进程（workers 为0时不做任何事）"""
+        if self.workers > 0:
+            self._get_executor()
+
+    def _get_executor(self):
+        executor = self._executor
+        if executor is not None and self._pid == os.getpid():
+            return executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = self._create_executor()
+                self._pid = os.getpid()
+                if not self._registered:
+                    atexit.register(self.shutdown)
+                    self._registered = True
+            return self._executor
+
+    def _create_executor(self):
+        # 优先使用 fork：spawn 会在子进程中重新执行启动脚本(run.py)
+        # 的模块级代码；子进程只做哈希计算，不会使用继承的连接等资源
+        mp_context = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context("fork")
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context)
+        # 子进程按需创建，提交空任务使其立即全部启动
+        for future in [executor.submit(int) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _reset(self, executor):
+        """进程池损坏后丢弃，下次使用时重建"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        logger.error("密码哈希进程池已损坏，将重建")
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            logger.warning("密码哈希队列已满，拒绝请求")
+            raise HasherBusy(self.retry_after)
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset(executor)
+            raise HasherBusy(self.retry_after)
+        except BaseException:
+            self._slots.release()
+            raise
+        # 名额在任务结束（包括超时后才结束）时释放
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            logger.error("密码哈希超时")
+            raise HasherBusy(self.retry_after)
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise HasherBusy(self.retry_after)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def hash_password(password):
+    """在哈希进程池中生成密码哈希"""
+    return current_app.extensions["password_hasher"].hash(password)
+
+
+def verify_password(pwhash, password):
+    """在哈希进程池中校验密码"""
+    return current_app.extensions["password_hasher"].verify(pwhash, password)
@@ -0,0 +1,38 @@
+import hashlib
+from flask import current_app, request
+from .compression import ENCODINGS
+
+# 各接口的 Cache-Control：内容由 ETag 校验，max-age 内客户端可直接使用本地副本
+DETAIL_CACHE_CONTROL = "public, max-age=60"
+LISTING_CACHE_CONTROL = "public, max-age=10"
+SEARCH_CACHE_CONTROL = "public, max-age=30"
+FEED_CACHE_CONTROL = "no-store"  # 随机商品流每次不同
+
+
+def make_etag(*parts):
+    """由版本号等组成部分生成强ETag的值"""
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode())
+    return digest.hexdigest()[:32]
+
+
+def not_modified(etag, cache_control):
+    """If-None-Match 与 etag 匹配时返回304响应（不生成响应体），否则返回 None
+
+    压缩后的响应 ETag 带有内容编码后缀（见 compression.py），同样视为匹配。
+    """
+    for candidate in (etag, *(f"{etag}-{encoding}" for encoding in ENCODINGS)):
+        if request.if_none_match.contains(candidate):
+            response = current_app.response_class(status=304)
+            return with_validators(response, candidate, cache_control)
+    return None
+
+
+def with_validators(response, etag, cache_control):
+    """为响应设置 ETag 与 Cache-Control
+
+    响应格式随 Accept 变化（见 serializer.py），ETag 已包含响应格式。
+    """
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept")
+    return response
@@ -0,0 +1,41 @@
+import hashlib
+import time
+from flask import current_app
+from flask_jwt_extended import JWTManager
+
+
+class CachingJWTManager(JWTManager):
+    """缓存已验证令牌声明的 JWTManager
+
+    客户端会在有效期内反复使用同一个访问令牌，这里以令牌的 SHA-256 摘要为键，
+    缓存签名校验与解码后的声明，命中时跳过签名校验和JSON解析。
+    缓存条目不会超过令牌的 exp，已撤销的JTI总是绕过缓存重新解码。
+    """
+
+    def _decode_jwt_from_config(
+        self, encoded_token, csrf_value=None, allow_expired=False
+    ):
+        cache = current_app.extensions.get("jwt_decode_cache")
+        if cache is None or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(
+                encoded_token, csrf_value, allow_expired
+            )
+
+        key = hashlib.sha256(encoded_token.encode()).digest()
+        claims = cache.get(key)
+        if claims is not None:
+            revoked = current_app.extensions["revocation_cache"].is_revoked(
+                claims.get("jti")
+            )
+            if not revoked and claims.get("exp", 0) > time.time():
+                # 返回副本，避免处理函数修改缓存中的声明
+                return dict(claims)
+            cache.invalidate(key)
+
+        claims = super()._decode_jwt_from_config(
+            encoded_token, csrf_value, allow_expired
+        )
+        ttl = min(cache.ttl, claims.get("exp", 0) - time.time())
+        if ttl > 0:
+            cache.set(key, dict(claims), ttl=ttl)
+        return claims
@@ -7,6 +7,8 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
+    # 令牌版本号，TOKEN_REVOCATION_MODE=version 时递增即可使该用户的旧令牌全部失效
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     def __repr__(self):
         return f"<User {self.username}>"
@@ -20,6 +22,19 @@ class Product(db.Model):
     image = db.Column(db.String(200))  # 主图
     images = db.Column(db.Text, default="[]")  # 新增：多张图片URL列表（JSON格式）
     description = db.Column(db.Text)
+    # 目录版本号：每次创建/修改时取 catalog_state 的下一个版本，供增量同步使用
+    version = db.Column(
+        db.BigInteger, nullable=False, default=0, server_default="0", index=True
+    )
+    updated_at = db.Column(
+        db.DateTime,
+        default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+        nullable=True,
+    )
+
+    # 按价格排序与价格区间分页使用的复合索引
+    __table_args__ = (db.Index("ix_products_price_id", "price", "id"),)
 
     def __repr__(self):
         return f"<Product {self.name}>"
@@ -80,10 +95,39 @@ class TokenBlacklist(db.Model):
     __tablename__ = "token_blacklist"
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(36), nullable=False, unique=True)
+    # 已撤销令牌缓存按 created_at 增量同步
     created_at = db.Column(
-        db.DateTime, default=db.func.current_timestamp(), nullable=False
+        db.DateTime, default=db.func.current_timestamp(), nullable=False, index=True
     )
-    expires_at = db.Column(db.DateTime, nullable=False)
+    # 过期清理按 expires_at 范围删除，需要索引支持
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
 
     def __repr__(self):
         return f"<TokenBlacklist jti={self.jti}>"
+
+
+class CatalogState(db.Model):
+    """商品目录的全局版本计数器（单行）"""
+
+    __tablename__ = "catalog_state"
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    # 已清理的删除记录中的最大版本号，早于它的增量同步请求需要全量同步
+    pruned_version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CatalogState version={self.version}>"
+
+
+class ProductTombstone(db.Model):
+    """已删除商品的记录，供客户端增量同步删除操作"""
+
+    __tablename__ = "product_tombstones"
+    product_id = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, index=True)
+    deleted_at = db.Column(
+        db.DateTime, default=db.func.current_timestamp(), nullable=False
+    )
+
+    def __repr__(self):
+        return f"<ProductTombstone {self.product_id}@{self.version}>"
@@ -0,0 +1,157 @@
+import bisect
+import math
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import tuple_
+from .catalog import serialize_product
+from .fields import load_columns
+from .models import Product
+
+PAGE_CURSOR_SALT = "product-page"
+
+# 排序方式 -> (排序键, 是否降序)；relevance 仅用于搜索
+SORTS = {
+    "id": (lambda p: (p["id"],), False),
+    "price_asc": (lambda p: (p["price"], p["id"]), False),
+    "price_desc": (lambda p: (p["price"], p["id"]), True),
+    "relevance": (None, False),
+}
+
+
+class PageParams:
+    """排序、价格区间与分页参数"""
+
+    def __init__(self, sort, min_price, max_price, limit, cursor):
+        self.sort = sort
+        self.min_price = min_price
+        self.max_price = max_price
+        self.limit = limit
+        self.cursor = cursor  # 已解码的游标，第一页为 None
+
+    @classmethod
+    def from_args(cls, args, default_sort, allowed_sorts):
+        """解析请求参数，参数无效时抛出 ValueError（消息可直接返回给客户端）"""
+        sort = args.get("sort", default_sort)
+        if sort not in allowed_sorts:
+            raise ValueError(f"不支持的排序方式: {sort}")
+        prices = []
+        for name in ("min_price", "max_price"):
+            value = args.get(name, "")
+            try:
+                price = float(value) if value != "" else None
+            except ValueError:
+                raise ValueError("价格区间参数无效")
+            # nan 与任何价格比较都为假，会让结果静默为空；inf 同样不是有效价格
+            if price is not None and not math.isfinite(price):
+                raise ValueError("价格区间参数无效")
+            prices.append(price)
+        min_price, max_price = prices
+        limit = args.get("limit", type=int, default=None)
+        if limit is None:
+            limit = current_app.config["PRODUCT_PAGE_SIZE"]
+        limit = max(1, min(limit, current_app.config["PRODUCT_PAGE_MAX_SIZE"]))
+
+        cursor = None
+        token = args.get("cursor")
+        if token:
+            try:
+                cursor = _serializer().loads(token)
+            except BadSignature:
+                raise ValueError("无效的分页游标")
+            if (
+                not isinstance(cursor, dict)
+                or cursor.get("s") != sort
+                or (sort != "relevance" and not isinstance(cursor.get("k"), list))
+            ):
+                raise ValueError("无效的分页游标")
+        return cls(sort, min_price, max_price, limit, cursor)
+
+    def in_range(self, price):
+        return (self.min_price is None or price >= self.min_price) and (
+            self.max_price is None or price <= self.max_price
+        )
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt=PAGE_CURSOR_SALT)
+
+
+def _next_cursor(params, last):
+    key, _ = SORTS[params.sort]
+    return _serializer().dumps({"s": params.sort, "k": list(key(last))})
+
+
+def paginate_query(params, fields=None):
+    """在数据库中按 (price, id) 或 id 做基于游标的分页（seek），返回 (商品列表, 下一页游标)
+
+    翻页条件写成行比较 (price, id) > (上一页最后的 price, id)，配合
+    ix_products_price_id 索引从上一页结束处直接定位，与页码无关。
+    fields 为输出的字段子集，只查询这些列（以及游标使用的 price）。
+    """
+    query = Product.query
+    columns = load_columns(Product, fields, "price")
+    if columns is not None:
+        query = query.options(columns)
+    if params.min_price is not None:
+        query = query.filter(Product.price >= params.min_price)
+    if params.max_price is not None:
+        query = query.filter(Product.price <= params.max_price)
+
+    if params.sort == "id":
+        columns = (Product.id,)
+    else:
+        columns = (Product.price, Product.id)
+    descending = SORTS[params.sort][1]
+    if params.cursor is not None:
+        last = tuple(params.cursor["k"])
+        row = tuple_(*columns)
+        query = query.filter(row < last if descending else row > last)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(params.limit + 1).all()
+
+    products = [serialize_product(p, fields) for p in rows[: params.limit]]
+    next_cursor = None
+    if len(rows) > params.limit:
+        last = rows[params.limit - 1]
+        next_cursor = _next_cursor(params, {"id": last.id, "price": last.price})
+    return products, next_cursor
+
+
+def paginate_list(products, params, digest):
+    """对内存中的搜索结果做过滤、排序与分页，返回 (商品列表, 下一页游标)
+
+    相关度排序按结果中的位置翻页，游标带上结果摘要 digest（各 worker 相同，
+    只随结果内容变化）；结果已变化时位置失去意义，抛出 ValueError 由客户端
+    重新搜索。价格排序按 (price, id) 二分定位上一页结束的位置。
+    """
+    products = [p for p in products if params.in_range(p["price"])]
+    cursor = params.cursor
+    if params.sort == "relevance":
+        start = 0
+        if cursor is not None:
+            if cursor.get("v") != digest:
+                raise ValueError("搜索结果已变化，请重新搜索")
+            start = cursor.get("o", 0)
+        page = products[start : start + params.limit]
+        if start + len(page) < len(products):
+            token = _serializer().dumps(
+                {"s": params.sort, "v": digest, "o": start + len(page)}
+            )
+            return page, token
+        return page, None
+
+    key, descending = SORTS[params.sort]
+    products.sort(key=key, reverse=descending)
+    start = 0
+    if cursor is not None:
+        keys = [key(p) for p in products]
+        last = tuple(cursor["k"])
+        if descending:
+            # 降序列表中找第一个严格小于 last 的位置
+            start = len(keys) - bisect.bisect_left(keys[::-1], last)
+        else:
+            start = bisect.bisect_right(keys, last)
+    page = products[start : start + params.limit]
+    if start + len(page) < len(products):
+        return page, _next_cursor(params, page[-1])
+    return page, None
@@ -0,0 +1,156 @@
+import functools
+import logging
+import math
+import sqlite3
+import threading
+import time
+from flask import current_app, jsonify
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """进程内令牌桶存储（仅对当前 worker 生效）"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> (剩余令牌数, 上次更新时间, 回满时刻)；回满时刻按各自作用域的
+        # 速率与容量计算，清理时不依赖调用方的作用域
+        self._buckets = {}
+
+    def consume(self, key, rate, burst, now=None):
+        """尝试取出一个令牌，返回 (是否允许, 需要等待的秒数)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                allowed, wait = True, 0.0
+            else:
+                allowed, wait = False, (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return allowed, wait
+
+    def _prune(self, now):
+        # 已经回满的桶与新建的桶等价，可以直接丢弃
+        for key in [k for k, bucket in self._buckets.items() if bucket[2] <= now]:
+            del self._buckets[key]
+
+
+class SQLiteBackend:
+    """基于本地SQLite文件的令牌桶存储，同一主机上的多个 worker 共享限流状态"""
+
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, rate, burst, now=None):
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                allowed, wait = True, 0.0
+            else:
+                allowed, wait = False, (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) "
+                "VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, wait
+
+
+def create_backend(url):
+    """根据 RATELIMIT_STORAGE_URL 创建存储后端
+
+    支持 memory:// 与 sqlite:///<文件路径>
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///") :])
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    raise ValueError(f"不支持的限流存储: {url}")
+
+
+class RateLimiter:
+    """令牌桶限流器，各作用域的速率与容量从应用配置中读取"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def hit(self, scope, key):
+        config = current_app.config
+        rate = float(config[f"RATELIMIT_{scope}_RATE"])
+        burst = float(config[f"RATELIMIT_{scope}_BURST"])
+        try:
+            return self.backend.consume(f"{scope}:{key}", rate, burst)
+        except Exception as e:
+            # 存储不可用时放行，避免限流器本身造成服务不可用
+            logger.error(f"限流存储访问失败: {str(e)}")
+            return True, 0.0
+
+
+def rate_limit(scope, key_func):
+    """按 key_func() 返回的键对接口限流，超出限制时直接返回429
+
+    key_func 返回 None 时不限流。拒绝请求不会访问数据库。
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_app.config.get("RATELIMIT_ENABLED", True):
+                key = key_func()
+                if key is not None:
+                    allowed, wait = current_app.extensions["rate_limiter"].hit(
+                        scope, key
+                    )
+                    if not allowed:
+                        retry_after = max(1, math.ceil(wait))
+                        return (
+                            jsonify(
+                                {
+                                    "status": "error",
+                                    "error": "请求过于频繁，请稍后重试",
+                                    "retry_after": retry_after,
+                                }
+                            ),
+                            429,
+                            {"Retry-After": str(retry_after)},
+                        )
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,10 +1,39 @@
 from flask import Blueprint, request, jsonify, current_app
-from datetime import datetime
+from sqlalchemy.orm import contains_eager
 from . import db
 from .models import Product, CartItem, AIMessage
 from .auth import token_required
+from .changes import (
+    catalog_changes,
+    current_catalog_version,
+    mark_product_changed,
+    mark_product_deleted,
+)
+from .catalog import product_detail, serialize_product
+from .fields import (
+    CART_FIELDS,
+    DETAIL_FIELDS,
+    MESSAGE_FIELDS,
+    PRODUCT_FIELDS,
+    cart_fields,
+    load_columns,
+    parse_fields,
+    pick,
+)
+from .feed import rotation_page
+from .http_cache import (
+    DETAIL_CACHE_CONTROL,
+    FEED_CACHE_CONTROL,
+    LISTING_CACHE_CONTROL,
+    SEARCH_CACHE_CONTROL,
+    make_etag,
+    not_modified,
+    with_validators,
+)
+from .pagination import PageParams, paginate_list, paginate_query
+from .search import index_product, run_search, suggest_index, unindex_product
+from .serializer import response_format
 import json
-import random
 
 main_api = Blueprint("main_api", __name__)
 
@@ -15,6 +44,34 @@ def health_check():
     return jsonify({"status": "healthy"}), 200
 
 
+@main_api.route("/api/metrics", methods=["GET"])
+def metrics():
+    """进程内缓存统计信息"""
+    return (
+        jsonify(
+            {
+                "user_cache": current_app.extensions["user_cache"].stats(),
+                "jwt_decode_cache": current_app.extensions["jwt_decode_cache"].stats(),
+                "search_cache": current_app.extensions["search_cache"].stats(),
+                "product_detail_cache": current_app.extensions[
+                    "product_detail_cache"
+                ].stats(),
+                "thumbnails": current_app.extensions["thumbnails"].stats(),
+                "compression": current_app.extensions["compressor"].stats(),
+            }
+        ),
+        200,
+    )
+
+
+@main_api.route("/api/assets", methods=["GET"])
+def asset_manifest():
+    """静态文件名 -> 带内容哈希的URL（可永久缓存）"""
+    response = jsonify(current_app.extensions["assets"].urls())
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 @main_api.route("/")
 def home():
     return jsonify(
@@ -35,66 +92,76 @@ def home():
     )
 
 
-# 添加全局变量存储上一次的商品组合
-last_product_combination = []
+LISTING_ARGS = ("sort", "min_price", "max_price", "limit", "cursor")
+LISTING_SORTS = ("id", "price_asc", "price_desc")
+SEARCH_SORTS = ("relevance", "price_asc", "price_desc")
+
+
+def _page_response(products, next_cursor):
+    """商品列表响应，存在下一页时在 X-Next-Cursor 头中返回游标"""
+    response = jsonify(products)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
 
 
 @main_api.route("/api/products", methods=["GET"])
 def get_products():
-    # 获取所有商品
-    all_products = Product.query.all()
-
-    # 如果商品数量不足5个，直接返回所有商品
-    if len(all_products) <= 5:
-        return jsonify(
-            [
-                {
-                    "id": p.id,
-                    "name": p.name,
-                    "price": p.price,
-                    "image": p.image,
-                    "description": p.description,
-                }
-                for p in all_products
-            ]
+    # 带排序/价格区间/分页参数时按条件分页返回商品列表
+    if any(name in request.args for name in LISTING_ARGS):
+        try:
+            params = PageParams.from_args(request.args, "id", LISTING_SORTS)
+            fields = parse_fields(request.args, PRODUCT_FIELDS)
+        except ValueError as e:
+            return jsonify({"status": "error", "error": str(e)}), 400
+        # 列表直接来自数据库，目录版本号未变化时内容不变
+        etag = make_etag(
+            "listing",
+            current_catalog_version(),
+            request.query_string,
+            response_format(),
         )
+        cached = not_modified(etag, LISTING_CACHE_CONTROL)
+        if cached is not None:
+            return cached
+        products, next_cursor = paginate_query(params, fields)
+        response = _page_response(products, next_cursor)
+        return with_validators(response, etag, LISTING_CACHE_CONTROL)
 
-    # 随机选择5个商品，确保与上一次不同
-    global last_product_combination
-    # 尝试最多10次找到不同的组合
-    for _ in range(10):
-        selected_products = random.sample(all_products, 5)
-        selected_ids = sorted([p.id for p in selected_products])
-
-        # 检查是否与上一次相同
-        if selected_ids != last_product_combination:
-            last_product_combination = selected_ids
-            return jsonify(
-                [
-                    {
-                        "id": p.id,
-                        "name": p.name,
-                        "price": p.price,
-                        "image": p.image,
-                        "description": p.description,
-                    }
-                    for p in selected_products
-                ]
-            )
-    # 如果10次尝试后仍然相同，仍然返回随机选择的结果
-    selected_products = random.sample(all_products, 5)
-    return jsonify(
-        [
-            {
-                "id": p.id,
-                "name": p.name,
-                "price": p.price,
-                "image": p.image,
-                "description": p.description,
-            }
-            for p in selected_products
-        ]
-    )
+    try:
+        fields = parse_fields(request.args, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+
+    # 从内存中的商品目录快照抽取，不再每次加载全部商品
+    catalog = current_app.extensions["catalog"]
+    snapshot = catalog.snapshot()
+
+    # 商品目录过大未保存快照时，退化为数据库随机抽样
+    if snapshot is None:
+        response = jsonify([pick(p, fields) for p in catalog.random_products(5)])
+        response.headers["Cache-Control"] = FEED_CACHE_CONTROL
+        return response
+
+    # 如果商品数量不足5个，直接返回所有商品
+    if len(snapshot) <= 5:
+        return jsonify([pick(p, fields) for p in snapshot.products])
+
+    # 按加购热度加权抽样，别名表由后台任务维护，尚未构建时退回默认商品流
+    popularity_feed = current_app.extensions["popularity_feed"]
+    if request.args.get("mode") == "popular" and popularity_feed.ready:
+        products = popularity_feed.sample(5, snapshot)
+        response = jsonify([pick(p, fields) for p in products])
+        response.headers["Cache-Control"] = FEED_CACHE_CONTROL
+        return response
+
+    # 每个客户端按自己的随机排列翻页，排列用完前不会重复
+    cursor = request.headers.get("X-Feed-Cursor") or request.args.get("feed_cursor")
+    products, next_cursor = rotation_page(snapshot, cursor, 5)
+    response = jsonify([pick(p, fields) for p in products])
+    response.headers["X-Feed-Cursor"] = next_cursor
+    response.headers["Cache-Control"] = FEED_CACHE_CONTROL
+    return response
 
 
 @main_api.route("/api/products", methods=["POST"])
@@ -122,7 +189,11 @@ def create_product(current_user=None):
         description=data.get("description", ""),
     )
     db.session.add(new_product)
+    mark_product_changed(new_product)
     db.session.commit()
+    current_app.extensions["catalog"].invalidate()
+    index_product(new_product)
+    current_app.extensions["thumbnails"].pregenerate([new_product.image, *images])
 
     return jsonify({"message": "商品创建成功", "product_id": new_product.id}), 201
 
@@ -146,7 +217,15 @@ def update_product(product_id, current_user=None):
     if "images" in data and isinstance(data["images"], list):
         product.images = json.dumps(data["images"])  # 更新图片列表
 
+    mark_product_changed(product)
     db.session.commit()
+    current_app.extensions["catalog"].invalidate()
+    current_app.extensions["product_detail_cache"].invalidate(product.id)
+    index_product(product)
+    if "image" in data or "images" in data:
+        current_app.extensions["thumbnails"].pregenerate(
+            [product.image, *json.loads(product.images or "[]")]
+        )
     return jsonify({"status": "success", "message": "商品更新成功"}), 200
 
 
@@ -160,7 +239,11 @@ def delete_product(product_id, current_user=None):
     # 删除购物车中相关项
     CartItem.query.filter_by(product_id=product_id).delete()
     db.session.delete(product)
+    mark_product_deleted(product_id)
     db.session.commit()
+    current_app.extensions["catalog"].invalidate()
+    current_app.extensions["product_detail_cache"].invalidate(product_id)
+    unindex_product(product_id)
     return jsonify({"status": "success", "message": "商品已删除"}), 200
 
 
@@ -171,88 +254,115 @@ def search_products():
     if not keyword:
         return jsonify({"status": "error", "error": "缺少搜索关键词"}), 400
 
-    # 构建查询条件
-    from sqlalchemy import or_
+    try:
+        params = PageParams.from_args(request.args, "relevance", SEARCH_SORTS)
+        fields = parse_fields(request.args, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
 
-    products = Product.query.filter(
-        or_(
-            Product.name.ilike(f"%{keyword}%"),
-            Product.description.ilike(f"%{keyword}%"),
-        )
-    ).all()
+    products, fuzzy, digest = run_search(keyword)
+    etag = make_etag("search", digest, request.query_string, response_format())
+    cached = not_modified(etag, SEARCH_CACHE_CONTROL)
+    if cached is not None:
+        return cached
 
+    try:
+        products, next_cursor = paginate_list(products, params, digest)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    response = _page_response([pick(p, fields) for p in products], next_cursor)
+    response.headers["X-Search-Mode"] = "fuzzy" if fuzzy else "exact"
+    return with_validators(response, etag, SEARCH_CACHE_CONTROL)
+
+
+@main_api.route("/api/products/changes", methods=["GET"])
+def product_changes():
+    """增量同步：返回指定目录版本之后新增、修改和删除的商品"""
+    since = request.args.get("since", 0, type=int)
+    limit = request.args.get("limit", 500, type=int)
+    # 全量同步分页：上一页返回的 after 与 version
+    after = request.args.get("after") or None
+    snapshot = request.args.get("snapshot", type=int)
+    return jsonify(catalog_changes(since, max(1, min(limit, 1000)), after, snapshot))
+
+
+@main_api.route("/api/products/suggest", methods=["GET"])
+def suggest_products():
+    """商品名称自动补全，支持中文前缀、分词与拼音(全拼/首字母)前缀"""
+    prefix = request.args.get("q", "")
+    limit = min(request.args.get("limit", 10, type=int), 50)
+    suggestions = suggest_index().suggest(prefix, limit=max(limit, 1))
     return jsonify(
-        [
-            {
-                "id": p.id,
-                "name": p.name,
-                "price": p.price,
-                "image": p.image,
-                "description": p.description,
-            }
-            for p in products
-        ]
+        [{"id": product_id, "name": name} for product_id, name in suggestions]
     )
 
 
 @main_api.route("/api/products/<product_id>/detail", methods=["GET"])
 def get_product_detail(product_id):
     """获取商品详情(包含多张图片)"""
-    product = Product.query.get(product_id)
-    if not product:
+    try:
+        fields = parse_fields(request.args, DETAIL_FIELDS)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    fmt = response_format()
+    detail = product_detail(product_id, fields, fmt)
+    if detail is None:
         return jsonify({"status": "error", "error": "商品不存在"}), 404
 
-    try:
-        # 解析图片列表
-        images = json.loads(product.images) if product.images else []
-    except:
-        images = []
+    body, etag = detail
+    cached = not_modified(etag, DETAIL_CACHE_CONTROL)
+    if cached is not None:
+        return cached
 
-        # 确保至少有一张主图
-    if not images and product.image:
-        images = [product.image]
-
-    return jsonify(
-        {
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "image": product.image,
-            "images": images,  # 返回多张图片列表
-            "description": product.description,
-        }
-    )
+    response = current_app.json.raw_response(body, fmt)
+    return with_validators(response, etag, DETAIL_CACHE_CONTROL)
 
 
 @main_api.route("/api/cart", methods=["GET"])
 @token_required
 def get_cart(current_user):
-    # 使用join优化查询性能
-    items = (
+    try:
+        item_fields, product_fields = cart_fields(
+            parse_fields(request.args, CART_FIELDS)
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+
+    # 使用join优化查询性能，商品信息直接取自同一次join的结果
+    product_loader = contains_eager(CartItem.product)
+    if product_fields is not None:
+        product_loader = product_loader.options(
+            load_columns(Product, product_fields, "id")
+        )
+    query = (
         CartItem.query.filter_by(user_id=current_user.id)
         .join(Product, CartItem.product_id == Product.id)
-        .all()
+        .options(product_loader)
     )
+    if item_fields is not None:
+        query = query.options(load_columns(CartItem, item_fields, "product_id"))
 
     cart_data = [
-        {
-            "id": item.id,
-            "product": {
-                "id": item.product.id,
-                "name": item.product.name,
-                "price": item.product.price,
-                "image": item.product.image,
-                "description": item.product.description,
-            },
-            "quantity": item.quantity,
-            "updated_at": item.updated_at.isoformat() if item.updated_at else None,
-        }
-        for item in items
+        _serialize_cart_item(item, item_fields, product_fields) for item in query
     ]
-
     return jsonify(cart_data)
 
 
+def _serialize_cart_item(item, fields=None, product_fields=None):
+    """购物车项字段，只访问 fields 中的属性（未加载的列不会触发额外查询）"""
+    fields = fields or ("id", "product", "quantity", "updated_at")
+    data = {}
+    if "id" in fields:
+        data["id"] = item.id
+    if "product" in fields:
+        data["product"] = serialize_product(item.product, product_fields)
+    if "quantity" in fields:
+        data["quantity"] = item.quantity
+    if "updated_at" in fields:
+        data["updated_at"] = item.updated_at.isoformat() if item.updated_at else None
+    return data
+
+
 @main_api.route("/api/cart", methods=["POST"])
 @token_required
 def add_to_cart(current_user):
@@ -273,9 +383,9 @@ def add_to_cart(current_user):
     try:
         if cart_item:
             cart_item.quantity += 1
-            # 如果updated_at字段存在则更新
+            # 如果updated_at字段存在则更新（与新建记录一样使用数据库时钟）
             if hasattr(cart_item, "updated_at"):
-                cart_item.updated_at = datetime.utcnow()
+                cart_item.updated_at = db.func.current_timestamp()
         else:
             cart_item = CartItem(
                 user_id=current_user.id, product_id=product_id, quantity=1
@@ -345,9 +455,9 @@ def update_cart_quantity(current_user):
 
     cart_item.quantity = quantity
 
-    # 如果updated_at字段存在则更新
+    # 如果updated_at字段存在则更新（与新建记录一样使用数据库时钟）
     if hasattr(cart_item, "updated_at"):
-        cart_item.updated_at = datetime.utcnow()
+        cart_item.updated_at = db.func.current_timestamp()
 
     try:
         db.session.commit()
@@ -473,22 +583,18 @@ def remove_from_cart(current_user, item_id):
 @main_api.route("/api/ai/messages", methods=["GET"])
 @token_required
 def get_ai_messages(current_user):
+    try:
+        fields = parse_fields(request.args, MESSAGE_FIELDS) or MESSAGE_FIELDS
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+
     messages = (
         AIMessage.query.filter_by(user_id=current_user.id)
+        .options(load_columns(AIMessage, fields))
         .order_by(AIMessage.timestamp)
         .all()
     )
-    return jsonify(
-        [
-            {
-                "id": msg.id,
-                "role": msg.role,
-                "content": msg.content,
-                "timestamp": msg.timestamp,
-            }
-            for msg in messages
-        ]
-    )
+    return jsonify([{name: getattr(msg, name) for name in fields} for msg in messages])
 
 
 @main_api.route("/api/ai/messages/<int:message_id>", methods=["DELETE"])
@@ -0,0 +1,582 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from array import array
+from collections import Counter
+import numpy as np
+from flask import current_app
+from .catalog import serialize_product
+from .changes import current_catalog_version, product_changes_since
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+def field_terms(text):
+    """商品文本的索引词及词频（与商品关键词使用同一套分词规则）"""
+    from .ai_proxy import count_terms
+
+    counts = Counter()
+    if text:
+        for term, count in count_terms(text).items():
+            counts[term.lower()] += count
+    return counts
+
+
+def normalize_query(text):
+    """规范化搜索词：统一大小写并合并空白，用作缓存键与热门搜索统计"""
+    return " ".join((text or "").lower().split())
+
+
+def query_terms(text):
+    """搜索词的分词结果；分不出索引词时把整个搜索词当作一个词"""
+    from .ai_proxy import extract_terms
+
+    text = (text or "").strip()
+    terms = {term.lower() for term in extract_terms(text)}
+    return terms or ({text.lower()} if text else set())
+
+
+def char_ngrams(text, n=3):
+    """字符n-gram及出现次数，每个词首补两个空格、词尾补一个空格(同 pg_trgm)"""
+    grams = Counter()
+    for word in (text or "").lower().split():
+        padded = f"  {word} "
+        for i in range(len(padded) - n + 1):
+            grams[padded[i : i + n]] += 1
+    return grams
+
+
+def char_counts(text):
+    """单个字符及出现次数（忽略空白），用于子串匹配的候选筛选"""
+    return Counter(c for c in (text or "").lower() if not c.isspace())
+
+
+class _Postings:
+    """倒排表数据：词ID -> (文档号, 名称词频, 描述词频) 的紧凑数组
+
+    文档号按加入顺序分配，倒排表只追加不修改。删除或更新商品时把旧文档号
+    标记为失效（更新会分配新的文档号），失效记录在查询时被过滤，
+    并在下一次全量重建时被清除。
+    """
+
+    def __init__(self):
+        self.term_ids = {}  # 词 -> 词ID
+        self.docs = []  # 词ID -> array('i') 文档号
+        self.name_tf = []  # 词ID -> array('f') 名称中的词频
+        self.desc_tf = []  # 词ID -> array('f') 描述中的词频
+        self.df = []  # 词ID -> 包含该词的有效文档数
+        self.cache = {}  # 词ID -> 倒排表的 numpy 数组
+        self.doc_of = {}  # 商品ID -> 文档号
+        self.product_ids = []  # 文档号 -> 商品ID
+        self.doc_terms = []  # 文档号 -> 词ID元组
+        self.alive = np.zeros(1024, dtype=bool)
+        self.name_len = np.zeros(1024)
+        self.desc_len = np.zeros(1024)
+        self.total_name_len = 0.0
+        self.total_desc_len = 0.0
+
+    def __len__(self):
+        return len(self.doc_of)
+
+    @property
+    def dead(self):
+        """已失效（删除或被更新替换）但仍留在倒排表中的文档数"""
+        return len(self.product_ids) - len(self.doc_of)
+
+    def _term_id(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.term_ids[term] = len(self.docs)
+            self.docs.append(array("i"))
+            self.name_tf.append(array("f"))
+            self.desc_tf.append(array("f"))
+            self.df.append(0)
+        return term_id
+
+    def _grow(self, size):
+        capacity = len(self.alive)
+        if size > capacity:
+            extra = max(size, capacity * 2) - capacity
+            self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+            self.name_len = np.concatenate([self.name_len, np.zeros(extra)])
+            self.desc_len = np.concatenate([self.desc_len, np.zeros(extra)])
+
+    def add(self, product_id, name_terms, desc_terms):
+        self.remove(product_id)
+        doc = len(self.product_ids)
+        self._grow(doc + 1)
+        self.product_ids.append(product_id)
+        self.doc_of[product_id] = doc
+
+        term_ids = []
+        for term in name_terms.keys() | desc_terms.keys():
+            term_id = self._term_id(term)
+            self.docs[term_id].append(doc)
+            self.name_tf[term_id].append(name_terms.get(term, 0))
+            self.desc_tf[term_id].append(desc_terms.get(term, 0))
+            self.df[term_id] += 1
+            self.cache.pop(term_id, None)
+            term_ids.append(term_id)
+        self.doc_terms.append(tuple(term_ids))
+
+        self.alive[doc] = True
+        self.name_len[doc] = sum(name_terms.values())
+        self.desc_len[doc] = sum(desc_terms.values())
+        self.total_name_len += self.name_len[doc]
+        self.total_desc_len += self.desc_len[doc]
+
+    def remove(self, product_id):
+        doc = self.doc_of.pop(product_id, None)
+        if doc is None:
+            return
+        self.alive[doc] = False
+        self.total_name_len -= self.name_len[doc]
+        self.total_desc_len -= self.desc_len[doc]
+        for term_id in self.doc_terms[doc]:
+            self.df[term_id] -= 1
+        self.doc_terms[doc] = ()
+
+    def _arrays(self, term_id):
+        arrays = self.cache.get(term_id)
+        if arrays is None:
+            arrays = self.cache[term_id] = (
+                np.array(self.docs[term_id], dtype=np.int64),
+                np.array(self.name_tf[term_id], dtype=np.float64),
+                np.array(self.desc_tf[term_id], dtype=np.float64),
+            )
+        return arrays
+
+    def score(self, terms, require_all, name_weight, k1, b):
+        """对包含查询词的文档计算 BM25 分数，返回 (文档号数组, 分数数组)
+
+        名称与描述分别做长度归一化后按 name_weight:1 合并词频(BM25F)，
+        只访问查询词的倒排表，耗时与命中文档数成正比。
+        """
+        term_ids = [self.term_ids.get(term) for term in set(terms)]
+        term_ids = [t for t in term_ids if t is not None and self.df[t] > 0]
+        if not term_ids or (require_all and len(term_ids) < len(set(terms))):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        count = len(self)
+        avg_name = self.total_name_len / count or 1.0
+        avg_desc = self.total_desc_len / count or 1.0
+        all_docs, all_scores = [], []
+        for term_id in term_ids:
+            docs, name_tf, desc_tf = self._arrays(term_id)
+            live = self.alive[docs]
+            docs, name_tf, desc_tf = docs[live], name_tf[live], desc_tf[live]
+            tf = name_weight * name_tf / (
+                1 - b + b * self.name_len[docs] / avg_name
+            ) + desc_tf / (1 - b + b * self.desc_len[docs] / avg_desc)
+            df = self.df[term_id]
+            idf = np.log1p((count - df + 0.5) / (df + 0.5))
+            all_docs.append(docs)
+            all_scores.append(idf * tf * (k1 + 1) / (tf + k1))
+
+        docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        if require_all and len(term_ids) > 1:
+            matched = np.bincount(inverse, minlength=len(docs)) == len(term_ids)
+            docs, scores = docs[matched], scores[matched]
+        return docs, scores
+
+    def overlap(self, terms, max_postings):
+        """统计每个文档包含的查询词个数，返回 (文档号数组, 命中数, 名称中的命中数)
+
+        按文档频率从低到高读取倒排表，累计读取超过 max_postings 条后不再读取
+        更常见的词，使耗时有上界（此时结果为近似值）。
+        """
+        term_ids = [self.term_ids.get(term) for term in set(terms)]
+        term_ids = sorted(
+            (t for t in term_ids if t is not None and self.df[t] > 0),
+            key=lambda t: self.df[t],
+        )
+        all_docs, all_in_name, scanned = [], [], 0
+        for term_id in term_ids:
+            if scanned >= max_postings:
+                break
+            docs, name_tf, _ = self._arrays(term_id)
+            scanned += len(docs)
+            live = self.alive[docs]
+            all_docs.append(docs[live])
+            all_in_name.append(name_tf[live] > 0)
+        if not all_docs:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+
+        docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+        matched = np.bincount(inverse, minlength=len(docs))
+        in_name = np.bincount(
+            inverse, weights=np.concatenate(all_in_name), minlength=len(docs)
+        )
+        return docs, matched, in_name
+
+
+class SearchIndex:
+    """商品倒排索引与 BM25 排序
+
+    首次使用时从数据库全量构建；本 worker 的商品增删改通过 add()/remove()
+    增量更新，其他 worker 的修改在查询时按目录版本号发现并增量追上（见
+    sync_search_indexes），后台任务定期 build() 重建后原子替换。
+    查询只访问命中词的倒排表，用 NumPy 向量化计算分数并以 argpartition
+    取前k个，耗时与商品总数无关。
+    另有一份以字符三元组为词的倒排表，供精确搜索无结果时做容错匹配；以及
+    一份单字符倒排表，单字、跨词的片段等前两者都找不到时做子串匹配（与原来
+    的 LIKE 搜索结果一致）。
+    """
+
+    def __init__(
+        self,
+        name_weight=2.0,
+        k1=1.2,
+        b=0.75,
+        fuzzy_threshold=0.4,
+        fuzzy_max_postings=200000,
+    ):
+        self.name_weight = name_weight
+        self.k1 = k1
+        self.b = b
+        self.fuzzy_threshold = fuzzy_threshold
+        self.fuzzy_max_postings = fuzzy_max_postings
+        self._lock = threading.Lock()
+        self._postings = _Postings()
+        self._grams = _Postings()
+        self._chars = _Postings()
+        self.built = False
+        self.version = 0  # 每次重建或增删改后递增，作为搜索结果缓存键的一部分
+        self.catalog_version = 0  # 索引已包含的商品目录版本（见 changes.py）
+        self.sync_lock = threading.Lock()
+
+    def build(self, rows):
+        """由 (商品ID, 名称, 描述) 序列全量构建索引，构建完成后原子替换"""
+        postings, grams, chars = _Postings(), _Postings(), _Postings()
+        for product_id, name, description in rows:
+            postings.add(product_id, field_terms(name), field_terms(description))
+            grams.add(product_id, char_ngrams(name), char_ngrams(description))
+            chars.add(product_id, char_counts(name), char_counts(description))
+        with self._lock:
+            self._postings, self._grams, self._chars = postings, grams, chars
+            self.built = True
+            self.version += 1
+        logger.info(
+            f"重建商品倒排索引: {len(postings)} 个商品，{len(postings.term_ids)} 个词，"
+            f"{len(grams.term_ids)} 个三元组"
+        )
+
+    def ensure_built(self):
+        """尚未构建时从数据库加载（需要应用上下文）"""
+        if not self.built:
+            self.build(_product_rows())
+
+    def invalidate(self):
+        """丢弃索引，下次使用时重建"""
+        with self._lock:
+            self.built = False
+
+    def add_terms(self, product_id, name_terms, desc_terms, grams=None, chars=None):
+        """以分好的词频新增或更新商品
+
+        grams 为 (名称三元组, 描述三元组)，chars 为 (名称字符, 描述字符)。
+        """
+        with self._lock:
+            self._postings.add(product_id, name_terms, desc_terms)
+            if grams is not None:
+                self._grams.add(product_id, *grams)
+            if chars is not None:
+                self._chars.add(product_id, *chars)
+            self.version += 1
+
+    def add(self, product):
+        """新增或更新商品"""
+        if self.built:
+            self.add_terms(
+                product.id,
+                field_terms(product.name),
+                field_terms(product.description),
+                grams=(char_ngrams(product.name), char_ngrams(product.description)),
+                chars=(char_counts(product.name), char_counts(product.description)),
+            )
+
+    def remove(self, product_id):
+        with self._lock:
+            self._postings.remove(product_id)
+            self._grams.remove(product_id)
+            self._chars.remove(product_id)
+            self.version += 1
+
+    def rank(self, terms, k=None, require_all=True):
+        """按 BM25 分数从高到低返回匹配商品的ID，最多k个
+
+        require_all 为真时只返回包含全部查询词的商品，否则包含任意一个即可。
+        """
+        if not terms:
+            return []
+        with self._lock:
+            postings = self._postings
+            docs, scores = postings.score(
+                terms, require_all, self.name_weight, self.k1, self.b
+            )
+            if k is not None and k < len(docs):
+                top = np.argpartition(-scores, k - 1)[:k]
+                docs, scores = docs[top], scores[top]
+            # 分数相同时按加入顺序排列
+            order = np.lexsort((docs, -scores))
+            return [postings.product_ids[doc] for doc in docs[order]]
+
+    def fuzzy(self, text, k=20, threshold=None):
+        """容错匹配：按查询三元组在商品中出现的比例排序，返回不低于阈值的前k个商品ID
+
+        比例相同时名称中命中更多的排在前面。
+        """
+        threshold = self.fuzzy_threshold if threshold is None else threshold
+        grams = char_ngrams(text)
+        if not grams:
+            return []
+        with self._lock:
+            postings = self._grams
+            docs, matched, in_name = postings.overlap(grams, self.fuzzy_max_postings)
+            similarity = matched / len(grams)
+            keep = similarity >= threshold
+            docs, similarity, in_name = docs[keep], similarity[keep], in_name[keep]
+            order = np.lexsort((docs, -in_name, -similarity))[:k]
+            return [postings.product_ids[doc] for doc in docs[order]]
+
+    def candidates(self, text, k=100):
+        """子串匹配的候选：包含搜索词全部字符的商品ID，按 BM25 分数取前k个
+
+        单个字符的搜索词即为精确结果；多个字符时调用方需再检查是否连续出现。
+        """
+        chars = char_counts(text)
+        if not chars:
+            return []
+        with self._lock:
+            postings = self._chars
+            docs, scores = postings.score(
+                chars, True, self.name_weight, self.k1, self.b
+            )
+            if k < len(docs):
+                top = np.argpartition(-scores, k - 1)[:k]
+                docs, scores = docs[top], scores[top]
+            order = np.lexsort((docs, -scores))
+            return [postings.product_ids[doc] for doc in docs[order]]
+
+    def dead_ratio(self):
+        """失效文档数与有效文档数之比，过高时应全量重建以回收空间"""
+        with self._lock:
+            postings = self._postings
+            return postings.dead / max(len(postings), 1)
+
+    def __len__(self):
+        return len(self._postings)
+
+
+class QueryLog:
+    """热门搜索词统计，用于下次启动时预热搜索结果缓存
+
+    只保留出现次数最多的 max_keys 个搜索词，超出时淘汰低频词。
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, query):
+        with self._lock:
+            self._counts[query] += 1
+            if len(self._counts) > self.max_keys * 2:
+                self._counts = Counter(dict(self._counts.most_common(self.max_keys)))
+
+    def top(self, n):
+        with self._lock:
+            return [query for query, _ in self._counts.most_common(n)]
+
+    def save(self, path, n):
+        """把前n个热门搜索词写入文件（先写临时文件再替换）"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.top(n), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def _product_rows():
+    return Product.query.with_entities(
+        Product.id, Product.name, Product.description
+    ).yield_per(10000)
+
+
+def load_products(product_ids):
+    """按主键批量读取商品，保持 product_ids 的顺序"""
+    if not product_ids:
+        return []
+    products = {
+        p.id: p for p in Product.query.filter(Product.id.in_(product_ids)).all()
+    }
+    return [products[i] for i in product_ids if i in products]
+
+
+def sync_search_indexes():
+    """让搜索与补全索引追上商品目录版本（需要应用上下文）
+
+    每次查询读取一次 catalog_state 版本号（单行主键查询）；版本前进时读取
+    这之间修改与删除的商品增量更新索引，变更过多或删除记录已清理时全量
+    重建。因此其他 worker 的商品修改在下一次查询时即可被搜索到，不依赖
+    后台任务。增删改留下的失效文档超过 SEARCH_COMPACT_DEAD_RATIO 时也全量
+    重建，回收倒排表空间。
+    """
+    index = current_app.extensions["search_index"]
+    suggest = current_app.extensions["suggest_index"]
+    max_dead_ratio = current_app.config["SEARCH_COMPACT_DEAD_RATIO"]
+
+    def up_to_date():
+        return (
+            index.built
+            and suggest.built
+            and index.catalog_version >= version
+            and index.dead_ratio() <= max_dead_ratio
+        )
+
+    version = current_catalog_version()
+    if up_to_date():
+        return
+    with index.sync_lock:
+        if up_to_date():
+            return
+        changes = None
+        if index.built and suggest.built and index.dead_ratio() <= max_dead_ratio:
+            changes = product_changes_since(
+                index.catalog_version, current_app.config["SEARCH_SYNC_MAX_CHANGES"]
+            )
+        if changes is None:
+            # 先记下版本再读取商品，读取期间的修改会在下次查询时再追上
+            rows = _product_rows().all()
+            index.build(rows)
+            suggest.build((product_id, name) for product_id, name, _ in rows)
+        else:
+            products, deleted = changes
+            for product_id in deleted:
+                unindex_product(product_id)
+            for product in products:
+                index_product(product)
+        index.catalog_version = version
+
+
+def search_index():
+    """当前应用的倒排索引，必要时先构建或追上其他 worker 的修改（需要应用上下文）"""
+    sync_search_indexes()
+    return current_app.extensions["search_index"]
+
+
+def suggest_index():
+    """当前应用的自动补全索引，必要时先构建或追上其他 worker 的修改（需要应用上下文）"""
+    sync_search_indexes()
+    return current_app.extensions["suggest_index"]
+
+
+def index_product(product):
+    """商品新增或更新后同步更新搜索与补全索引"""
+    current_app.extensions["search_index"].add(product)
+    current_app.extensions["suggest_index"].add(product.id, product.name)
+
+
+def unindex_product(product_id):
+    """商品删除后从搜索与补全索引中移除"""
+    current_app.extensions["search_index"].remove(product_id)
+    current_app.extensions["suggest_index"].remove(product_id)
+
+
+def run_search(keyword, record=True):
+    """执行商品搜索，返回 (商品列表, 是否为容错匹配, 结果摘要)
+
+    结果按 (索引版本, 规范化搜索词) 缓存，商品增删改或索引重建后版本变化，
+    旧结果不再命中并逐渐被 LRU 淘汰。结果摘要在写入缓存时计算一次，
+    内容相同则摘要相同（与 worker 无关），用于生成 ETag。
+    """
+    index = search_index()
+    cache = current_app.extensions["search_cache"]
+    query = normalize_query(keyword)
+    if record:
+        current_app.extensions["search_query_log"].record(query)
+
+    key = (index.version, query)
+    result = cache.get(key)
+    if result is None:
+        # 按相关度查找同时包含全部搜索词的商品，没有结果时按字符三元组做容错匹配，
+        # 仍没有结果（单字、跨词片段等）时按子串匹配
+        limit = current_app.config["SEARCH_FUZZY_LIMIT"]
+        product_ids = index.rank(query_terms(query))
+        fuzzy = not product_ids
+        if fuzzy:
+            product_ids = index.fuzzy(query, k=limit)
+        if product_ids:
+            products = load_products(product_ids)
+        else:
+            products = _containing(load_products(index.candidates(query)), query)
+            products = products[:limit]
+        products = [serialize_product(p) for p in products]
+        digest = hashlib.sha1(
+            json.dumps([products, fuzzy], sort_keys=True).encode()
+        ).hexdigest()
+        result = (products, fuzzy, digest)
+        cache.set(key, result)
+    return result
+
+
+def _containing(products, query):
+    """保留名称或描述中包含搜索词每个片段的商品（忽略大小写）"""
+    words = query.split()
+    return [
+        p
+        for p in products
+        if all(
+            word in (p.name or "").lower() or word in (p.description or "").lower()
+            for word in words
+        )
+    ]
+
+
+def save_top_queries():
+    """后台任务：保存热门搜索词（需要应用上下文）"""
+    try:
+        current_app.extensions["search_query_log"].save(
+            current_app.config["SEARCH_TOP_QUERIES_PATH"],
+            current_app.config["SEARCH_WARM_QUERIES"],
+        )
+    except Exception as e:
+        logger.error(f"保存热门搜索词失败: {str(e)}")
+
+
+def warm_search_cache():
+    """用上次运行保存的热门搜索词预热结果缓存（需要应用上下文），返回预热的数量"""
+    path = current_app.config["SEARCH_TOP_QUERIES_PATH"]
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, encoding="utf-8") as f:
+            queries = json.load(f)
+        for query in queries[: current_app.config["SEARCH_WARM_QUERIES"]]:
+            run_search(query, record=False)
+        logger.info(f"预热了 {len(queries)} 个热门搜索")
+        return len(queries)
+    except Exception as e:
+        logger.error(f"预热搜索缓存失败: {str(e)}")
+        return 0
+
+
+def rebuild_search_index():
+    """后台任务：重建搜索与补全索引以同步其他 worker 的商品修改（需要应用上下文）"""
+    try:
+        index = current_app.extensions["search_index"]
+        with index.sync_lock:
+            version = current_catalog_version()
+            rows = _product_rows().all()
+            index.build(rows)
+            current_app.extensions["suggest_index"].build(
+                (product_id, name) for product_id, name, _ in rows
+            )
+            index.catalog_version = version
+    except Exception as e:
+        logger.error(f"重建商品搜索索引失败: {str(e)}")
@@ -0,0 +1,54 @@
+import msgpack
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+MSGPACK_MIMETYPE = "application/msgpack"
+
+# 响应格式 -> MIME 类型；application/x-msgpack 为旧客户端使用的别名
+MIMETYPES = {"json": "application/json", "msgpack": MSGPACK_MIMETYPE}
+_ACCEPTED = {
+    "application/json": "json",
+    MSGPACK_MIMETYPE: "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+
+
+def response_format():
+    """按 Accept 头选择响应格式，明确优先 MessagePack 时返回 msgpack，否则为 json"""
+    if not has_request_context():
+        return "json"
+    best = request.accept_mimetypes.best_match(list(_ACCEPTED), default=None)
+    return _ACCEPTED.get(best, "json")
+
+
+class ResponseSerializer(DefaultJSONProvider):
+    """所有蓝图共用的响应序列化器
+
+    作为应用的 JSON provider，jsonify 经由这里生成响应：请求头
+    Accept: application/msgpack 时返回 MessagePack，否则与原来一样返回
+    JSON。两种格式都带 Vary: Accept。日期等类型的转换规则与 JSON 相同。
+    """
+
+    def response(self, *args, **kwargs):
+        fmt = response_format()
+        if fmt == "json":
+            response = super().response(*args, **kwargs)
+        else:
+            obj = self._prepare_response_obj(args, kwargs)
+            response = self._app.response_class(
+                self.encode(obj, fmt), mimetype=MIMETYPES[fmt]
+            )
+        response.vary.add("Accept")
+        return response
+
+    def encode(self, obj, fmt):
+        """按指定格式编码为字节"""
+        if fmt == "msgpack":
+            return msgpack.packb(obj, default=self.default, use_bin_type=True)
+        return f"{self.dumps(obj, separators=(',', ':'))}\n".encode()
+
+    def raw_response(self, body, fmt):
+        """由已编码的字节生成响应"""
+        response = self._app.response_class(body, mimetype=MIMETYPES[fmt])
+        response.vary.add("Accept")
+        return response
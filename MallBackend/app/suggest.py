@@ -0,0 +1,104 @@
+import bisect
+import logging
+import threading
+from pypinyin import Style, lazy_pinyin
+from .search import field_terms
+
+logger = logging.getLogger(__name__)
+
+# 匹配来源，数值越小排序越靠前
+NAME, TOKEN, PINYIN = 0, 1, 2
+
+
+def normalize(text):
+    """统一大小写并去掉空白"""
+    return "".join((text or "").lower().split())
+
+
+def suggestion_keys(name):
+    """商品名称的前缀匹配键：完整名称、分词结果、全拼与拼音首字母"""
+    keys = {(normalize(name), NAME)}
+    keys.update((normalize(term), TOKEN) for term in field_terms(name))
+    keys.add((normalize("".join(lazy_pinyin(name))), PINYIN))
+    keys.add((normalize("".join(lazy_pinyin(name, style=Style.FIRST_LETTER))), PINYIN))
+    return {(key, kind) for key, kind in keys if key}
+
+
+class SuggestIndex:
+    """商品名称自动补全索引
+
+    所有匹配键以 (键, 来源, 商品ID) 的形式保存在有序数组中，前缀查询用
+    bisect 定位后顺序扫描，最多扫描 scan_limit 条记录。商品增删改时按
+    商品记录的键逐条插入/删除，无需整体重建。
+    """
+
+    def __init__(self, scan_limit=200):
+        self.scan_limit = scan_limit
+        self._lock = threading.Lock()
+        self._entries = []  # 有序的 (键, 来源, 商品ID)
+        self._names = {}  # 商品ID -> 名称
+        self._keys_of = {}  # 商品ID -> 该商品的键
+        self.built = False
+
+    def build(self, rows):
+        """由 (商品ID, 名称) 序列全量构建索引，构建完成后原子替换"""
+        entries, names, keys_of = [], {}, {}
+        for product_id, name in rows:
+            keys = suggestion_keys(name)
+            entries.extend((key, kind, product_id) for key, kind in keys)
+            names[product_id] = name
+            keys_of[product_id] = keys
+        entries.sort()
+        with self._lock:
+            self._entries, self._names, self._keys_of = entries, names, keys_of
+            self.built = True
+        logger.info(f"重建商品补全索引: {len(names)} 个商品，{len(entries)} 个键")
+
+    def invalidate(self):
+        """丢弃索引，下次使用时重建"""
+        with self._lock:
+            self.built = False
+
+    def _remove(self, product_id):
+        self._names.pop(product_id, None)
+        for key, kind in self._keys_of.pop(product_id, ()):
+            entry = (key, kind, product_id)
+            i = bisect.bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def add(self, product_id, name):
+        """新增或更新商品"""
+        keys = suggestion_keys(name)
+        with self._lock:
+            if not self.built:
+                return
+            self._remove(product_id)
+            for key, kind in keys:
+                bisect.insort(self._entries, (key, kind, product_id))
+            self._names[product_id] = name
+            self._keys_of[product_id] = keys
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def suggest(self, prefix, limit=10):
+        """返回以 prefix 开头的商品 [(商品ID, 名称)]，名称直接匹配的排在前面"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        best = {}  # 商品ID -> 最优来源
+        with self._lock:
+            start = bisect.bisect_left(self._entries, (prefix,))
+            for key, kind, product_id in self._entries[start : start + self.scan_limit]:
+                if not key.startswith(prefix):
+                    break
+                if kind < best.get(product_id, PINYIN + 1):
+                    best[product_id] = kind
+            names = {product_id: self._names[product_id] for product_id in best}
+        ranked = sorted(best, key=lambda i: (best[i], len(names[i]), names[i]))
+        return [(product_id, names[product_id]) for product_id in ranked[:limit]]
+
+    def __len__(self):
+        return len(self._names)
@@ -0,0 +1,172 @@
+import atexit
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+# 输出格式 -> (Pillow 格式名, MIME 类型, 扩展名)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", "webp"),
+    "png": ("PNG", "image/png", "png"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+EXTENSIONS = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp"}
+
+
+class ThumbnailStore:
+    """商品图片缩略图
+
+    缩略图按 (原图内容哈希, 宽度, 格式) 命名保存在 cache_dir 中，原图替换后
+    哈希变化，自动生成新的缩略图。宽度取 widths 中不小于请求宽度的最小值，
+    避免任意宽度撑满磁盘。同一缩略图的并发请求只生成一次，其余请求等待
+    生成完成后直接读取文件；文件先写入临时文件再原子改名，多个 worker
+    同时生成时也不会读到不完整的文件。
+    """
+
+    def __init__(
+        self, source_dir, cache_dir, widths=(100, 200, 400), quality=80, workers=1
+    ):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.widths = sorted(widths)
+        self.quality = quality
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._inflight = {}  # 缩略图文件名 -> 生成锁
+        self._hashes = {}  # 原图路径 -> (mtime, 大小, 内容哈希)
+        self._executor = None
+        self.generated = 0
+        self.hits = 0
+
+    def resolve_width(self, width):
+        for allowed in self.widths:
+            if allowed >= width:
+                return allowed
+        return self.widths[-1]
+
+    def resolve_format(self, filename, fmt=None):
+        """输出格式，未指定时与原图相同；不支持时抛出 ValueError"""
+        if fmt is None:
+            fmt = EXTENSIONS.get(os.path.splitext(filename)[1].lower(), "png")
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的图片格式: {fmt}")
+        return fmt
+
+    def _source_path(self, filename):
+        path = safe_join(self.source_dir, filename)
+        if path is None or not os.path.isfile(path):
+            raise FileNotFoundError(filename)
+        return path
+
+    def _content_hash(self, path):
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+        digest = digest.hexdigest()[:20]
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def get(self, filename, width, fmt=None):
+        """返回 (缩略图路径, MIME 类型)，需要时生成
+
+        原图不存在时抛出 FileNotFoundError，格式不支持或不是图片时抛出 ValueError。
+        """
+        fmt = self.resolve_format(filename, fmt)
+        width = self.resolve_width(width)
+        source = self._source_path(filename)
+        _, mimetype, ext = FORMATS[fmt]
+        name = f"{self._content_hash(source)}-w{width}.{ext}"
+        target = os.path.join(self.cache_dir, name)
+        if os.path.exists(target):
+            self.hits += 1
+            return target, mimetype
+
+        with self._lock:
+            lock = self._inflight.setdefault(name, threading.Lock())
+        try:
+            with lock:
+                if os.path.exists(target):
+                    self.hits += 1
+                else:
+                    self._render(source, target, width, fmt)
+                    self.generated += 1
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+        return target, mimetype
+
+    def _render(self, source, target, width, fmt):
+        pil_format = FORMATS[fmt][0]
+        try:
+            with Image.open(source) as image:
+                image.thumbnail((width, width * 10))  # 只缩小不放大，保持宽高比
+                if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                os.makedirs(self.cache_dir, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        if pil_format == "PNG":
+                            image.save(f, pil_format, optimize=True)
+                        else:
+                            image.save(f, pil_format, quality=self.quality)
+                    os.replace(tmp, target)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+        except FileNotFoundError:
+            raise
+        except OSError as e:  # 包括 UnidentifiedImageError
+            raise ValueError(f"无法处理图片: {os.path.basename(source)}") from e
+        logger.info(f"生成缩略图 {os.path.basename(target)}")
+
+    def pregenerate(self, filenames, formats=("webp",)):
+        """后台生成图片的全部宽度的缩略图（原格式与 formats），返回 Future
+
+        只处理本地静态目录中存在的图片，外链图片与缺失的文件直接跳过。
+        """
+        names = list(dict.fromkeys(n for n in filenames if isinstance(n, str) and n))
+        return self._get_executor().submit(self._pregenerate, names, formats)
+
+    def _pregenerate(self, filenames, formats):
+        count = 0
+        for filename in filenames:
+            for fmt in (None, *formats):
+                for width in self.widths:
+                    try:
+                        self.get(filename, width, fmt)
+                        count += 1
+                    except FileNotFoundError:
+                        break
+                    except ValueError as e:
+                        logger.warning(f"预生成缩略图失败: {str(e)}")
+                        break
+        return count
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="thumbnail"
+                    )
+                    atexit.register(self.shutdown)
+        return self._executor
+
+    def stats(self):
+        return {"generated": self.generated, "hits": self.hits}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,6 @@
 import logging
 import re
+import time
 from datetime import datetime
 from sqlalchemy import inspect, text
 from flask import current_app
@@ -25,9 +26,26 @@ def check_database_schema():
         db = current_app.extensions["sqlalchemy"]
         inspector = inspect(db.engine)
 
+        # 增量同步使用的新表，缺失时直接创建
+        required_tables = ["catalog_state", "product_tombstones"]
+        missing_tables = [
+            t for t in required_tables if t not in inspector.get_table_names()
+        ]
+        if missing_tables:
+            logger.info(f"创建缺失的表: {', '.join(missing_tables)}")
+            db.metadata.create_all(
+                db.engine, tables=[db.metadata.tables[t] for t in missing_tables]
+            )
+
+        # 商品目录版本计数器行
+        from .changes import ensure_catalog_state
+
+        ensure_catalog_state()
+
         required_columns = {
             "cart_items": ["updated_at"],
-            "products": ["images"],  # 检查products表的images字段
+            "products": ["images", "version", "updated_at"],
+            "users": ["token_version"],
         }
 
         fixed_count = 0
@@ -48,6 +66,20 @@ def check_database_schema():
                                         f"ADD COLUMN {col} TEXT DEFAULT '[]'"
                                     )
                                 )
+                            elif col == "version":
+                                db.session.execute(
+                                    text(
+                                        f"ALTER TABLE {table} "
+                                        f"ADD COLUMN {col} BIGINT NOT NULL DEFAULT 0"
+                                    )
+                                )
+                            elif col == "token_version":
+                                db.session.execute(
+                                    text(
+                                        f"ALTER TABLE {table} "
+                                        f"ADD COLUMN {col} INTEGER NOT NULL DEFAULT 0"
+                                    )
+                                )
                             else:
                                 db.session.execute(
                                     text(
@@ -71,6 +103,36 @@ def check_database_schema():
                             except Exception as simple_err:
                                 logger.error(f"简单添加字段失败: {str(simple_err)}")
 
+        # 检查查询依赖的索引
+        required_indexes = {
+            "token_blacklist": {
+                "ix_token_blacklist_expires_at": ["expires_at"],
+                "ix_token_blacklist_created_at": ["created_at"],
+            },
+            "products": {
+                "ix_products_price_id": ["price", "id"],
+                "ix_products_version": ["version"],
+            },
+        }
+
+        for table, indexes in required_indexes.items():
+            if table in inspector.get_table_names():
+                existing_indexes = [idx["name"] for idx in inspector.get_indexes(table)]
+
+                for name, columns in indexes.items():
+                    if name not in existing_indexes:
+                        logger.info(f"添加缺失索引 {name} 到表 {table}")
+                        try:
+                            db.session.execute(
+                                text(
+                                    f"CREATE INDEX {name} ON {table} "
+                                    f"({', '.join(columns)})"
+                                )
+                            )
+                            fixed_count += 1
+                        except Exception as index_err:
+                            logger.error(f"添加索引失败: {str(index_err)}")
+
         if fixed_count > 0:
             db.session.commit()
             logger.info(f"修复了 {fixed_count} 个数据库字段问题")
@@ -188,28 +250,62 @@ def seed_initial_data():
         print(f"初始化数据时出错: {str(e)}")
 
 
-def cleanup_expired_tokens():
-    """定期清理过期令牌"""
+def cleanup_expired_tokens(chunk_size=1000, pause=0.05):
+    """定期清理过期令牌
+
+    按 expires_at 索引分批执行集合删除，每批单独提交，避免一次性加载全部
+    过期记录以及长时间持有锁，可以在线上流量期间运行。批次之间暂停 pause 秒。
+    返回删除数量、批次数与耗时。
+    """
+    stats = {"deleted": 0, "chunks": 0, "elapsed": 0.0}
+    start = time.perf_counter()
     try:
         # 确保有当前应用上下文
         from flask import current_app
 
         db = current_app.extensions["sqlalchemy"]
-        from .models import TokenBlacklist
 
+        # 截止时间固定为开始时刻，保证循环能够结束
         now = datetime.utcnow()
-        expired_tokens = TokenBlacklist.query.filter(
-            TokenBlacklist.expires_at < now
-        ).all()
-
-        for token in expired_tokens:
-            db.session.delete(token)
+        if db.engine.dialect.name == "mysql":
+            stmt = text(
+                "DELETE FROM token_blacklist WHERE expires_at < :now "
+                "ORDER BY expires_at LIMIT :limit"
+            )
+        else:
+            # SQLite 等默认不支持 DELETE ... LIMIT，改为按主键子查询删除
+            stmt = text(
+                "DELETE FROM token_blacklist WHERE id IN ("
+                "SELECT id FROM token_blacklist WHERE expires_at < :now "
+                "ORDER BY expires_at LIMIT :limit)"
+            )
 
-        db.session.commit()
-        logger.info(f"清理了 {len(expired_tokens)} 个过期令牌")
-        print(f"清理了 {len(expired_tokens)} 个过期令牌")
+        while True:
+            result = db.session.execute(stmt, {"now": now, "limit": chunk_size})
+            db.session.commit()
+            deleted = result.rowcount or 0
+            stats["deleted"] += deleted
+            stats["chunks"] += 1
+            logger.info(
+                f"清理过期令牌: 第 {stats['chunks']} 批删除 {deleted} 个，"
+                f"累计 {stats['deleted']} 个"
+            )
+            if deleted < chunk_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+        stats["elapsed"] = round(time.perf_counter() - start, 3)
+        logger.info(
+            f"清理了 {stats['deleted']} 个过期令牌，"
+            f"共 {stats['chunks']} 批，耗时 {stats['elapsed']}s"
+        )
+        print(f"清理了 {stats['deleted']} 个过期令牌")
 
     except Exception as e:
         logger.error(f"清理令牌错误: {str(e)}")
         if "db" in locals() and hasattr(db, "session"):
             db.session.rollback()
+        stats["elapsed"] = round(time.perf_counter() - start, 3)
+
+    return stats
@@ -0,0 +1,103 @@
+"""登录风暴期间 /api/products 的延迟基准测试
+
+对一个正在运行的 MallBackend 实例（如 python run.py）发起测试：
+先测量空闲时 /api/products 的延迟，再在并发登录请求的压力下测量一次，
+对比两者的 p50/p99。密码哈希在独立进程池中执行时，两组 p99 应基本持平。
+
+登录限流（RATELIMIT_LOGIN_USER/RATELIMIT_LOGIN_IP）默认开启，同一用户名与IP
+的登录请求绝大多数会在哈希之前被429拒绝，测到的是限流器而不是哈希进程池，
+因此被测实例需关闭限流启动；出现429时本脚本报错退出。
+
+用法:
+    RATELIMIT_ENABLED=false python run.py
+    python benchmarks/bench_login_burst.py --base-url http://localhost:5000 \\
+        --username 123456 --password password123
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure_products(base_url, count):
+    """顺序请求 /api/products，返回每次请求的耗时(ms)"""
+    session = requests.Session()
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        session.get(f"{base_url}/api/products").raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def login_burst(base_url, username, password, stop, stats):
+    session = requests.Session()
+    while not stop.is_set():
+        response = session.post(
+            f"{base_url}/api/login",
+            json={"username": username, "password": password},
+        )
+        stats[response.status_code] = stats.get(response.status_code, 0) + 1
+
+
+def report(label, samples):
+    print(
+        f"{label:<12} n={len(samples):<5} "
+        f"p50={statistics.median(samples):7.2f}ms "
+        f"p99={percentile(samples, 99):7.2f}ms "
+        f"max={max(samples):7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--username", default="123456")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--login-threads", type=int, default=16)
+    args = parser.parse_args()
+
+    # 预热
+    measure_products(args.base_url, 20)
+    report("idle", measure_products(args.base_url, args.requests))
+
+    stop = threading.Event()
+    stats = {}
+    threads = [
+        threading.Thread(
+            target=login_burst,
+            args=(args.base_url, args.username, args.password, stop, stats),
+            daemon=True,
+        )
+        for _ in range(args.login_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        report("login-burst", measure_products(args.base_url, args.requests))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    print(f"登录响应状态分布: {dict(sorted(stats.items()))}")
+    if stats.get(429):
+        sys.exit(
+            "登录请求被限流(429)，结果不能反映密码哈希的影响；"
+            "请以 RATELIMIT_ENABLED=false 启动被测实例后重试"
+        )
+
+
+if __name__ == "__main__":
+    main()
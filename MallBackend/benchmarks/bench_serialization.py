@@ -0,0 +1,87 @@
+"""响应序列化基准测试：jsonify 与 MessagePack
+
+用合成的商品列表与购物车数据（购物车每项带完整商品信息）比较编码耗时的
+p50 以及响应体大小（原始与 gzip 压缩后）。不依赖数据库。
+
+用法:
+    python benchmarks/bench_serialization.py --sizes 20 100 500
+"""
+
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask, jsonify  # noqa: E402
+from app.serializer import ResponseSerializer  # noqa: E402
+
+
+def make_products(size):
+    return [
+        {
+            "id": str(i),
+            "name": f"商品{i} 旗舰版",
+            "price": 1999.0 + i,
+            "image": f"p{i}.png",
+            "description": "高性能处理器，长续航电池，支持快速充电与无线充电。" * 2,
+        }
+        for i in range(size)
+    ]
+
+
+def make_cart(size):
+    return [
+        {
+            "id": i,
+            "product": product,
+            "quantity": i % 5 + 1,
+            "updated_at": "2024-01-01T12:00:00",
+        }
+        for i, product in enumerate(make_products(size))
+    ]
+
+
+def measure(encode, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        body = encode()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.json = ResponseSerializer(app)
+    with app.test_request_context():
+        for name, factory in (("商品列表", make_products), ("购物车", make_cart)):
+            for size in args.sizes:
+                payload = factory(size)
+                results = {
+                    "jsonify": measure(
+                        lambda: jsonify(payload).get_data(), args.rounds
+                    ),
+                    "msgpack": measure(
+                        lambda: app.json.encode(payload, "msgpack"), args.rounds
+                    ),
+                }
+                line = [f"{name} {size:>4} 项"]
+                for label, (p50, body) in results.items():
+                    line.append(
+                        f"{label} {p50:6.3f}ms {len(body):>7}B "
+                        f"(gzip {len(gzip.compress(body)):>6}B)"
+                    )
+                print(" | ".join(line))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 import sys
 import os
+import atexit
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 from app import create_app, db
 from app.utils import cleanup_expired_tokens, seed_initial_data, check_database_schema
+from app.catalog import warm_product_details
+from app.changes import prune_tombstones
+from app.feed import refresh_popularity_feed
+from app.search import rebuild_search_index, save_top_queries, warm_search_cache
 import socket
+from datetime import datetime
 from sqlalchemy import text
 
 # 添加项目根目录到系统路径
@@ -26,12 +32,52 @@ logger = logging.getLogger(__name__)
 def cleanup_job():
     """在应用上下文中运行清理任务的包装函数"""
     with app.app_context():
-        cleanup_expired_tokens()
+        cleanup_expired_tokens(chunk_size=app.config["TOKEN_CLEANUP_CHUNK_SIZE"])
+        prune_tombstones(app.config["PRODUCT_TOMBSTONE_RETENTION_DAYS"])
+
+
+def popularity_job():
+    """在应用上下文中刷新热度商品流"""
+    with app.app_context():
+        refresh_popularity_feed()
+
+
+def search_index_job():
+    """在应用上下文中重建商品倒排索引"""
+    with app.app_context():
+        rebuild_search_index()
+
+
+def top_queries_job():
+    """在应用上下文中保存热门搜索词"""
+    with app.app_context():
+        save_top_queries()
 
 
 # 配置定时任务清理过期令牌
 scheduler = BackgroundScheduler()
 scheduler.add_job(cleanup_job, "interval", hours=1)
+# 定时刷新热度商品流的别名表，启动后立即执行一次
+scheduler.add_job(
+    popularity_job,
+    "interval",
+    seconds=app.config["POPULARITY_REFRESH_INTERVAL"],
+    next_run_time=datetime.now(),
+)
+# 定时重建商品倒排索引，启动后立即执行一次
+scheduler.add_job(
+    search_index_job,
+    "interval",
+    seconds=app.config["SEARCH_INDEX_REBUILD_INTERVAL"],
+    next_run_time=datetime.now(),
+)
+# 定时保存热门搜索词，退出时再保存一次，供下次启动预热搜索缓存
+scheduler.add_job(
+    top_queries_job,
+    "interval",
+    seconds=app.config["SEARCH_TOP_QUERIES_SAVE_INTERVAL"],
+)
+atexit.register(top_queries_job)
 scheduler.start()
 
 if __name__ == "__main__":
@@ -50,6 +96,16 @@ if __name__ == "__main__":
             logger.info("正在初始化数据...")
             seed_initial_data()
 
+            # 4. 预加载已撤销令牌缓存
+            app.extensions["revocation_cache"].load()
+
+            # 5. 用上次运行的热门搜索预热搜索缓存，并预先编码商品详情
+            warm_search_cache()
+            warm_product_details()
+
+            # 6. 计算静态文件内容哈希并生成预压缩版本
+            app.extensions["assets"].build()
+
         except Exception as e:
             logger.error(f"数据库初始化失败: {str(e)}")
             try:
@@ -111,3 +111,15 @@ def test_reload_keywords_without_auth(test_client):
     """测试未认证重新加载关键词"""
     response = test_client.post("/api/ai/reload-keywords")
     assert response.status_code == 401
+
+
+def test_get_ai_messages_sparse_fields(authenticated_client, init_database):
+    """测试AI消息 fields 参数只返回指定字段"""
+    authenticated_client.post(
+        "/api/ai/messages",
+        json={"role": "user", "content": "你好", "timestamp": 1234567890},
+    )
+
+    response = authenticated_client.get("/api/ai/messages?fields=role,content")
+    assert response.json == [{"role": "user", "content": "你好"}]
+    assert authenticated_client.get("/api/ai/messages?fields=x").status_code == 400
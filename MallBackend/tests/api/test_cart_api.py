@@ -87,3 +87,22 @@ def test_remove_nonexistent_cart_item(authenticated_client):
     """测试删除不存在的购物车项"""
     response = authenticated_client.delete("/api/cart/999")
     assert response.status_code == 404
+
+
+def test_get_cart_sparse_fields(authenticated_client, sql_statements):
+    """测试购物车 fields 参数只查询并返回指定字段"""
+    authenticated_client.post("/api/cart", json={"product_id": "1"})
+    with sql_statements as statements:
+        response = authenticated_client.get(
+            "/api/cart?fields=quantity,product.name,product.price"
+        )
+
+    assert response.json == [
+        {"product": {"name": "华为手机", "price": 1999.0}, "quantity": 1}
+    ]
+    cart_query = [s for s in statements if "cart_items" in s][-1]
+    assert "description" not in cart_query
+    assert "updated_at" not in cart_query
+
+    response = authenticated_client.get("/api/cart?fields=quantity,stock")
+    assert response.status_code == 400
@@ -114,3 +114,302 @@ def test_search_products_empty_result(test_client):
     response = test_client.get("/api/products/search?q=不存在的关键词")
     assert response.status_code == 200
     assert len(response.json) == 0
+
+
+def _walk_pages(client, url):
+    """按 X-Next-Cursor 依次请求所有分页，返回商品ID列表"""
+    ids, cursor = [], None
+    while True:
+        page_url = f"{url}&cursor={cursor}" if cursor else url
+        response = client.get(page_url)
+        assert response.status_code == 200
+        ids.extend(p["id"] for p in response.json)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+
+def test_product_listing_keyset_pagination(test_client, test_app, init_database):
+    """测试商品列表的价格排序、价格区间与游标分页"""
+    from app import db
+    from app.models import Product
+
+    with test_app.app_context():
+        for i in range(25):
+            # 价格有重复，检验 (price, id) 作为翻页键
+            db.session.add(Product(id=f"k{i:02d}", name=f"商品{i}", price=i // 3))
+        db.session.commit()
+
+    ids = _walk_pages(test_client, "/api/products?sort=price_asc&limit=4")
+    assert len(ids) == len(set(ids)) == 27
+    assert ids[:3] == ["k00", "k01", "k02"]
+    assert ids[-2:] == ["1", "2"]  # 初始商品价格最高
+
+    ids = _walk_pages(
+        test_client, "/api/products?sort=price_desc&min_price=2&max_price=4&limit=2"
+    )
+    assert ids == ["k14", "k13", "k12", "k11", "k10", "k09", "k08", "k07", "k06"]
+
+    response = test_client.get("/api/products?sort=price_asc&cursor=bad")
+    assert response.status_code == 400
+    response = test_client.get("/api/products?sort=name")
+    assert response.status_code == 400
+    for value in ("nan", "inf", "-inf", "abc"):
+        response = test_client.get(f"/api/products?min_price={value}")
+        assert response.status_code == 400
+        response = test_client.get(f"/api/products/search?q=手机&max_price={value}")
+        assert response.status_code == 400
+
+
+def test_search_pagination(test_client, init_database):
+    """测试搜索结果的排序与分页"""
+    ids = _walk_pages(test_client, "/api/products/search?q=手机&limit=1")
+    assert sorted(ids) == ["1", "2"]
+
+    response = test_client.get("/api/products/search?q=手机&sort=price_desc")
+    assert [p["id"] for p in response.json] == ["2", "1"]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = test_client.get("/api/products/search?q=手机&max_price=2000")
+    assert [p["id"] for p in response.json] == ["1"]
+
+
+def test_search_cursor_follows_results(
+    authenticated_client, test_client, init_database
+):
+    """测试相关度游标只在搜索结果变化时失效，失效时返回400"""
+    url = "/api/products/search?q=手机&limit=1"
+    cursor = test_client.get(url).headers["X-Next-Cursor"]
+
+    # 与搜索结果无关的修改不影响游标
+    authenticated_client.post(
+        "/api/products", json={"id": "3", "name": "蓝牙耳机", "price": 199}
+    )
+    assert test_client.get(f"{url}&cursor={cursor}").status_code == 200
+
+    authenticated_client.post(
+        "/api/products", json={"id": "4", "name": "老人手机", "price": 299}
+    )
+    response = test_client.get(f"{url}&cursor={cursor}")
+    assert response.status_code == 400
+
+
+def test_product_changes_delta_sync(authenticated_client, test_client, test_app):
+    """测试商品增量同步：全量、增量、删除记录与分批返回"""
+    response = test_client.get("/api/products/changes")
+    assert response.status_code == 200
+    assert response.json["full"] is True
+    assert {p["id"] for p in response.json["products"]} == {"1", "2"}
+    version = response.json["version"]
+
+    authenticated_client.post(
+        "/api/products", json={"id": "3", "name": "蓝牙耳机", "price": 199}
+    )
+    authenticated_client.put("/api/products/1", json={"price": 1899})
+    authenticated_client.delete("/api/products/2")
+
+    changes = test_client.get(f"/api/products/changes?since={version}").json
+    assert changes["full"] is False and changes["has_more"] is False
+    assert [p["id"] for p in changes["products"]] == ["3", "1"]
+    assert changes["products"][1]["price"] == 1899
+    assert changes["deleted"] == ["2"]
+    assert changes["version"] == version + 3
+
+    # 分批返回，按返回的 version 继续同步
+    first = test_client.get(f"/api/products/changes?since={version}&limit=2").json
+    assert first["has_more"] is True
+    assert [p["id"] for p in first["products"]] == ["3", "1"]
+    rest = test_client.get(f"/api/products/changes?since={first['version']}").json
+    assert rest["deleted"] == ["2"] and rest["products"] == []
+
+    # 已同步到最新版本时没有变更
+    latest = test_client.get(f"/api/products/changes?since={changes['version']}").json
+    assert latest["products"] == [] and latest["deleted"] == []
+
+    # 删除记录被清理后，更早的版本需要全量同步
+    from app.changes import prune_tombstones
+
+    with test_app.app_context():
+        assert prune_tombstones(retention_days=-1) == 1
+    assert test_client.get(f"/api/products/changes?since={version}").json["full"]
+
+
+def test_product_changes_full_sync_pages(authenticated_client, test_client):
+    """测试全量同步按 limit 分页，分页期间的修改在之后的增量同步中返回"""
+    first = test_client.get("/api/products/changes?since=0&limit=1").json
+    assert first["full"] is True and first["has_more"] is True
+    assert [p["id"] for p in first["products"]] == ["1"]
+
+    authenticated_client.put("/api/products/1", json={"price": 1799})
+    rest = test_client.get(
+        "/api/products/changes?since=0&limit=1"
+        f"&after={first['after']}&snapshot={first['version']}"
+    ).json
+    assert [p["id"] for p in rest["products"]] == ["2"]
+    assert rest["has_more"] is False and rest["version"] == first["version"]
+
+    changes = test_client.get(f"/api/products/changes?since={rest['version']}").json
+    assert [p["id"] for p in changes["products"]] == ["1"]
+
+
+def test_conditional_get_with_etag(authenticated_client, test_client):
+    """测试详情、列表与搜索的 ETag/304 响应，以及修改后 ETag 变化"""
+    urls = [
+        "/api/products/1/detail",
+        "/api/products?sort=price_asc",
+        "/api/products/search?q=手机",
+    ]
+    etags = {}
+    for url in urls:
+        response = test_client.get(url)
+        assert response.status_code == 200
+        assert "max-age" in response.headers["Cache-Control"]
+        etags[url] = response.headers["ETag"]
+
+        response = test_client.get(url, headers={"If-None-Match": etags[url]})
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etags[url]
+
+    authenticated_client.put("/api/products/1", json={"price": 1899})
+    for url in urls:
+        response = test_client.get(url, headers={"If-None-Match": etags[url]})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etags[url]
+
+
+def test_product_detail_cache(authenticated_client, test_client, sql_statements):
+    """测试商品详情缓存命中时不访问数据库，修改与删除后失效"""
+    url = "/api/products/1/detail"
+    first = test_client.get(url)
+    assert first.status_code == 200
+    assert isinstance(first.json["images"], list)
+
+    with sql_statements as statements:
+        cached = test_client.get(url)
+    assert statements == []
+    assert cached.data == first.data
+    assert cached.headers["ETag"] == first.headers["ETag"]
+
+    authenticated_client.put("/api/products/1", json={"price": 1899})
+    assert test_client.get(url).json["price"] == 1899
+
+    authenticated_client.delete("/api/products/1")
+    assert test_client.get(url).status_code == 404
+
+
+def test_static_thumbnail(test_client, test_app, tmp_path, monkeypatch):
+    """测试静态图片带 w 参数时返回缩略图"""
+    monkeypatch.setattr(test_app.extensions["thumbnails"], "cache_dir", str(tmp_path))
+
+    response = test_client.get("/static/hw.png?w=100&format=webp")
+    assert response.status_code == 200
+    assert response.mimetype == "image/webp"
+    assert "max-age" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+    response.close()
+
+    response = test_client.get(
+        "/static/hw.png?w=100&format=webp", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    assert test_client.get("/static/hw.png?w=abc").status_code == 400
+    assert test_client.get("/static/missing.png?w=100").status_code == 404
+    assert test_client.get("/static/hw.png").mimetype == "image/png"
+
+
+def test_fingerprinted_static_assets(test_client):
+    """测试带哈希的静态URL、预压缩版本选择与 Range 请求"""
+    urls = test_client.get("/api/assets").json
+    url = urls["swagger.json"]
+    assert url != "/static/swagger.json"
+
+    plain = test_client.get(url)
+    assert plain.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert "Content-Encoding" not in plain.headers
+    assert test_client.get("/static/swagger.json").headers["Cache-Control"] == (
+        "no-cache"
+    )
+
+    compressed = test_client.get(url, headers={"Accept-Encoding": "gzip, br"})
+    assert compressed.headers["Content-Encoding"] == "br"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert len(compressed.data) < len(plain.data)
+    assert compressed.headers["ETag"] != plain.headers["ETag"]
+    response = test_client.get(url, headers={"If-None-Match": plain.headers["ETag"]})
+    assert response.status_code == 304
+
+    partial = test_client.get(url, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.data == plain.data[10:20]
+    assert partial.headers["Content-Range"] == f"bytes 10-19/{len(plain.data)}"
+    unsatisfiable = test_client.get(url, headers={"Range": "bytes=999999-"})
+    assert unsatisfiable.status_code == 416
+
+    image_url = urls["hw.png"]
+    response = test_client.get(f"{image_url}?w=100")
+    assert response.mimetype == "image/png"
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+def test_product_sparse_fields(test_client, init_database):
+    """测试商品列表、搜索与详情的 fields 参数"""
+    response = test_client.get("/api/products?sort=price_asc&limit=1&fields=name,price")
+    assert response.status_code == 200
+    assert all(set(p) == {"name", "price"} for p in response.json)
+    # 游标不依赖返回的字段
+    cursor = response.headers["X-Next-Cursor"]
+    next_page = test_client.get(
+        f"/api/products?sort=price_asc&limit=1&fields=name&cursor={cursor}"
+    ).json
+    assert next_page[0]["name"] not in {p["name"] for p in response.json}
+
+    response = test_client.get("/api/products?fields=id,image")
+    assert all(set(p) == {"id", "image"} for p in response.json)
+
+    response = test_client.get("/api/products/search?q=手机&fields=id")
+    assert response.json and all(set(p) == {"id"} for p in response.json)
+
+    full = test_client.get("/api/products/1/detail")
+    response = test_client.get("/api/products/1/detail?fields=name,images")
+    assert response.json == {"name": "华为手机", "images": full.json["images"]}
+    assert response.headers["ETag"] != full.headers["ETag"]
+
+    assert test_client.get("/api/products?fields=name,stock").status_code == 400
+    assert test_client.get("/api/products/1/detail?fields=x").status_code == 400
+
+
+def test_product_detail_images_only(test_client, init_database, sql_statements):
+    """测试详情只请求 images 时只返回图片，且不再逐列加载其他字段"""
+    with sql_statements as statements:
+        response = test_client.get("/api/products/1/detail?fields=images")
+    assert response.json == {"images": ["hw.png"]}
+    assert len(statements) == 1
+
+
+def test_msgpack_responses(authenticated_client, test_client, init_database):
+    """测试 Accept: application/msgpack 时各接口返回 MessagePack"""
+    import msgpack
+
+    headers = {"Accept": "application/msgpack"}
+    for url in ("/api/products/1/detail", "/api/products?sort=price_asc"):
+        json_response = test_client.get(url)
+        response = test_client.get(url, headers=headers)
+        assert response.mimetype == "application/msgpack"
+        assert msgpack.unpackb(response.data) == json_response.json
+        assert response.headers["ETag"] != json_response.headers["ETag"]
+        assert "Accept" in response.headers["Vary"]
+        cached = test_client.get(
+            url, headers={**headers, "If-None-Match": response.headers["ETag"]}
+        )
+        assert cached.status_code == 304
+
+    authenticated_client.post("/api/cart", json={"product_id": "1"})
+    response = authenticated_client.get("/api/cart", headers=headers)
+    assert msgpack.unpackb(response.data)[0]["product"]["id"] == "1"
+
+    # 其他蓝图（含错误响应）同样按 Accept 协商
+    response = test_client.post("/api/login", json={}, headers=headers)
+    assert response.mimetype == "application/msgpack"
+    assert test_client.get("/api/products/1/detail").mimetype == "application/json"
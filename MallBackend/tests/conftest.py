@@ -2,17 +2,25 @@ import pytest
 import os
 import sys
 from unittest.mock import MagicMock, patch
+from sqlalchemy import event
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app import create_app, db
-from app.models import User, Product, CartItem, AIMessage, TokenBlacklist
+from app.models import (
+    User,
+    Product,
+    CartItem,
+    AIMessage,
+    TokenBlacklist,
+    ProductTombstone,
+)
 from werkzeug.security import generate_password_hash
 
 
 @pytest.fixture(scope="module")
-def test_app():
+def test_app(tmp_path_factory):
     """创建测试应用"""
     app = create_app()
     app.config.update(
@@ -23,8 +31,13 @@ def test_app():
             "JWT_SECRET_KEY": "test-secret-key",
             "ARK_API_KEY": "test-ark-key",
             "ARK_BASE_URL": "https://test-ark.example.com/api/v3",
+            "RATELIMIT_ENABLED": False,
         }
     )
+    # 缩略图与静态文件预压缩版本写入临时目录
+    cache_dir = tmp_path_factory.mktemp("static-cache")
+    app.extensions["thumbnails"].cache_dir = str(cache_dir / "thumbnails")
+    app.extensions["assets"].variant_dir = str(cache_dir / "assets")
 
     with app.app_context():
         db.create_all()
@@ -51,7 +64,10 @@ def init_database(test_app):
         db.session.query(TokenBlacklist).delete()
         db.session.query(User).delete()
         db.session.query(Product).delete()
+        db.session.query(ProductTombstone).delete()
         db.session.commit()
+        # 用户ID可能被复用，清空进程内的用户缓存
+        test_app.extensions["user_cache"].clear()
 
         # 添加测试用户 - 使用正确的密码哈希生成方式
         test_user = User(
@@ -82,6 +98,11 @@ def init_database(test_app):
             db.session.add(product)
 
         db.session.commit()
+        test_app.extensions["catalog"].invalidate()
+        test_app.extensions["search_index"].invalidate()
+        test_app.extensions["suggest_index"].invalidate()
+        test_app.extensions["search_cache"].clear()
+        test_app.extensions["product_detail_cache"].clear()
         yield db
 
         # 测试结束后清理 - 按照正确的顺序删除
@@ -113,6 +134,35 @@ def authenticated_client(test_client, init_database):
         del test_client.environ_base["HTTP_AUTHORIZATION"]
 
 
+class StatementLog(list):
+    """在 with 块内记录执行的 SQL 语句"""
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+
+    def _record(self, conn, cursor, statement, *args):
+        self.append(statement)
+
+    def __enter__(self):
+        self.clear()
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+@pytest.fixture(scope="function")
+def sql_statements(test_app):
+    """SQL 语句记录器：with sql_statements as statements: ..."""
+    with test_app.app_context():
+        log = StatementLog(db.engine)
+    yield log
+    if event.contains(log.engine, "before_cursor_execute", log._record):
+        log.__exit__(None, None, None)
+
+
 @pytest.fixture(scope="function")
 def mock_ai_response():
     """模拟AI响应"""
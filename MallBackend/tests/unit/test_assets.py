@@ -0,0 +1,36 @@
+import gzip
+import json
+import pytest
+from app.assets import AssetManifest
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "doc.json").write_text(json.dumps({"paths": ["x" * 10] * 500}))
+    (static / "logo.png").write_bytes(b"\x89PNG" + bytes(range(256)) * 8)
+    return AssetManifest(str(static), str(tmp_path / "variants"))
+
+
+def test_manifest_fingerprints_and_precompresses(manifest, tmp_path):
+    """测试按内容哈希命名，只为文本文件预压缩，内容变化后哈希随之变化且旧URL失效"""
+    doc = manifest.get("doc.json")
+    assert doc.hashed_name == f"doc.{doc.digest}.json"
+    assert manifest.resolve(doc.hashed_name) == ("doc.json", True)
+    assert manifest.resolve("doc.json") == ("doc.json", False)
+    assert set(doc.variants) == {"br", "gzip"}
+    with open(doc.variants["gzip"], "rb") as f:
+        assert (
+            gzip.decompress(f.read()) == (tmp_path / "static" / "doc.json").read_bytes()
+        )
+    assert manifest.get("logo.png").variants == {}
+    assert manifest.get("missing.png") is None
+
+    (tmp_path / "static" / "doc.json").write_text("{}" * 2000)
+    fresh = manifest.get("doc.json")
+    assert manifest.url("doc.json") == f"/static/{fresh.hashed_name}"
+    assert fresh.hashed_name != doc.hashed_name
+    # 旧的带哈希URL不再对应任何文件
+    assert manifest.resolve(doc.hashed_name) == (doc.hashed_name, False)
+    assert manifest.resolve(fresh.hashed_name) == ("doc.json", True)
@@ -233,3 +233,105 @@ def test_token_required_with_different_user_ids(test_app, init_database):
             # 这个可能会失败，取决于JWT配置，但我们要测试装饰器的错误处理
             if response.status_code != 200:
                 assert response.status_code == 401
+
+
+def test_auth_context_resolves_user_once(test_app, init_database, sql_statements):
+    """测试认证上下文在同一请求内只查询一次用户"""
+    from app import db
+    from app.auth import get_auth_context
+    from app.models import User
+
+    with test_app.app_context():
+        user = User.query.filter_by(username="123456").first()
+        access_token = create_access_token(identity=str(user.id))
+
+    headers = {"Authorization": f"Bearer {access_token}"}
+    with test_app.test_client() as client:
+        # 预热已撤销令牌缓存
+        client.get("/api/verify", headers=headers)
+
+        with sql_statements as statements:
+            # 清空会话标识映射和用户缓存，确保用户需要从数据库加载
+            db.session.expunge_all()
+            test_app.extensions["user_cache"].clear()
+            response = client.get("/api/verify", headers=headers)
+            verify_count = len(statements)
+
+            # 处理函数内重复访问认证上下文不再产生查询
+            with test_app.test_request_context("/api/verify", headers=headers):
+                from flask_jwt_extended import verify_jwt_in_request
+
+                verify_jwt_in_request()
+                db.session.expunge_all()
+                test_app.extensions["user_cache"].clear()
+                statements.clear()
+                first = get_auth_context()
+                assert first.user.id == user.id
+                assert get_auth_context() is first
+                assert first.user.id == user.id
+                assert len(statements) == 1
+
+    assert response.status_code == 200
+    # 原实现每次请求需要查询黑名单和用户两条语句，现在只剩用户查询
+    assert verify_count == 1
+
+
+def test_token_version_revocation(test_app, test_client, init_database):
+    """测试令牌版本号撤销模式：修改密码后旧令牌失效且不写黑名单"""
+    from app.models import TokenBlacklist
+
+    test_app.config["TOKEN_REVOCATION_MODE"] = "version"
+    try:
+        response = test_client.post(
+            "/api/login", json={"username": "123456", "password": "password123"}
+        )
+        headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+        assert test_client.get("/api/verify", headers=headers).status_code == 200
+
+        response = test_client.post(
+            "/api/change_password",
+            json={"old_password": "password123", "new_password": "newpass123"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert TokenBlacklist.query.count() == 0
+
+        # 旧令牌版本号已落后
+        assert test_client.get("/api/verify", headers=headers).status_code == 401
+
+        # 重新登录获得的新令牌有效
+        response = test_client.post(
+            "/api/login", json={"username": "123456", "password": "newpass123"}
+        )
+        headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+        assert test_client.get("/api/verify", headers=headers).status_code == 200
+    finally:
+        test_app.config["TOKEN_REVOCATION_MODE"] = "blacklist"
+
+
+def test_token_version_increments_in_database(test_app, test_client, init_database):
+    """测试身份缓存中的版本号落后时，修改密码仍在数据库当前值上递增"""
+    from app import db
+    from app.models import User
+
+    test_app.config["TOKEN_REVOCATION_MODE"] = "version"
+    try:
+        response = test_client.post(
+            "/api/login", json={"username": "123456", "password": "password123"}
+        )
+        headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+        assert test_client.get("/api/verify", headers=headers).status_code == 200
+
+        # 模拟其他 worker 已递增版本号，本进程的身份缓存尚未过期
+        User.query.filter_by(username="123456").update({"token_version": 5})
+        db.session.commit()
+
+        response = test_client.post(
+            "/api/change_password",
+            json={"old_password": "password123", "new_password": "newpass123"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert User.query.filter_by(username="123456").first().token_version == 6
+    finally:
+        test_app.config["TOKEN_REVOCATION_MODE"] = "blacklist"
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+from app import db
+from app.cache import RevokedTokenCache
+from app.models import TokenBlacklist
+
+
+def test_revoked_token_cache_loads_and_adds(test_app, init_database):
+    """测试已撤销令牌缓存的加载与更新"""
+    with test_app.app_context():
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        db.session.add(TokenBlacklist(jti="cached-jti", expires_at=expires_at))
+        db.session.add(
+            TokenBlacklist(
+                jti="expired-jti", expires_at=datetime.utcnow() - timedelta(hours=1)
+            )
+        )
+        db.session.commit()
+
+        cache = RevokedTokenCache(sync_interval=60)
+        cache.load()
+        assert cache.is_revoked("cached-jti")
+        # 已过期的令牌无需缓存
+        assert not cache.is_revoked("expired-jti")
+
+        cache.add("local-jti", expires_at)
+        assert cache.is_revoked("local-jti")
+        assert not cache.is_revoked("unknown-jti")
+
+
+def test_revoked_token_cache_picks_up_late_commits(test_app, init_database):
+    """测试ID与创建时间更早、但在上次同步之后才提交的黑名单记录也会被同步"""
+    with test_app.app_context():
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        db.session.add(TokenBlacklist(id=100, jti="later-jti", expires_at=expires_at))
+        db.session.commit()
+
+        cache = RevokedTokenCache(sync_interval=0, sync_margin=60)
+        cache.load()
+        assert cache.is_revoked("later-jti")
+
+        # 另一个 worker 的事务先分配了ID与创建时间，但直到现在才提交
+        created_at = TokenBlacklist.query.get(100).created_at - timedelta(seconds=5)
+        db.session.add(
+            TokenBlacklist(
+                id=50, jti="late-jti", expires_at=expires_at, created_at=created_at
+            )
+        )
+        db.session.commit()
+        assert cache.is_revoked("late-jti")
+
+
+def test_blacklist_check_without_db_queries(authenticated_client, sql_statements):
+    """测试未撤销令牌的校验不再查询token_blacklist表"""
+    # 预热缓存
+    assert authenticated_client.get("/api/verify").status_code == 200
+
+    with sql_statements as statements:
+        response = authenticated_client.get("/api/verify")
+
+    assert response.status_code == 200
+    assert not [s for s in statements if "token_blacklist" in s]
+
+    # 登出后同一 worker 立即拒绝该令牌
+    assert authenticated_client.post("/api/logout").status_code == 200
+    assert authenticated_client.get("/api/verify").status_code == 401
+
+
+def test_ttl_cache_lru_and_expiry():
+    """测试TTL+LRU缓存的淘汰与过期"""
+    from app.cache import TTLCache
+
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # 插入第三项时淘汰最久未使用的 b
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] >= 1
+
+
+def test_user_cache_hit_and_invalidation(authenticated_client, test_app):
+    """测试用户缓存命中以及修改密码后的失效"""
+    cache = test_app.extensions["user_cache"]
+    assert authenticated_client.get("/api/verify").status_code == 200
+    hits = cache.hits
+    assert authenticated_client.get("/api/verify").status_code == 200
+    assert cache.hits == hits + 1
+
+    response = authenticated_client.post(
+        "/api/change_password",
+        json={"old_password": "password123", "new_password": "newpass123"},
+    )
+    assert response.status_code == 200
+    assert len(cache) == 0
+
+    # 新密码生效
+    response = authenticated_client.post(
+        "/api/login", json={"username": "123456", "password": "newpass123"}
+    )
+    assert response.status_code == 200
+
+    stats = authenticated_client.get("/api/metrics").json["user_cache"]
+    assert stats["hits"] >= 1
+
+
+def test_jwt_decode_cache_hits_and_revocation(authenticated_client, test_app):
+    """测试令牌解码缓存命中，以及撤销后绕过缓存"""
+    cache = test_app.extensions["jwt_decode_cache"]
+    assert authenticated_client.get("/api/verify").status_code == 200
+    hits = cache.hits
+    assert authenticated_client.get("/api/verify").status_code == 200
+    assert cache.hits == hits + 1
+
+    stats = authenticated_client.get("/api/metrics").json["jwt_decode_cache"]
+    assert stats["hit_ratio"] > 0
+
+    assert authenticated_client.post("/api/logout").status_code == 200
+    assert authenticated_client.get("/api/verify").status_code == 401
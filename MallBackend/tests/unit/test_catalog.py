@@ -0,0 +1,177 @@
+import pytest
+from app import db
+from app.catalog import Catalog
+from app.models import Product
+
+
+def _add_products(count):
+    for i in range(count):
+        db.session.add(
+            Product(id=f"p{i:03d}", name=f"商品{i}", price=10.0 + i, image="x.png")
+        )
+    db.session.commit()
+
+
+def test_snapshot_sampling_without_db(test_app, init_database, sql_statements):
+    """测试快照抽样不访问数据库，失效后重建并递增版本号"""
+    with test_app.app_context():
+        _add_products(20)
+        catalog = Catalog(max_items=1000, max_age=60)
+        snapshot = catalog.snapshot()
+        assert len(snapshot) == 22
+
+        with sql_statements as statements:
+            products = catalog.random_products(5)
+
+        assert len({p["id"] for p in products}) == 5
+        assert statements == []
+
+        version = catalog.version
+        catalog.invalidate()
+        assert catalog.snapshot().version == version + 1
+
+
+def test_db_sampling_fallback(test_app, init_database):
+    """测试目录过大时按主键区间在数据库中抽样"""
+    with test_app.app_context():
+        _add_products(50)
+        catalog = Catalog(max_items=10, max_age=60, stride=5)
+        assert catalog.snapshot() is None
+
+        products = catalog.random_products(5)
+        ids = [p["id"] for p in products]
+        assert len(ids) == len(set(ids))
+        assert 0 < len(ids) <= 5
+        assert all(Product.query.get(i) is not None for i in ids)
+
+
+def test_permuted_index_is_bijection():
+    """测试伪随机排列是 [0, n) 上的双射"""
+    from app.feed import permuted_index
+
+    for size in (1, 2, 7, 22, 100):
+        mapped = [permuted_index(i, size, seed=12345) for i in range(size)]
+        assert sorted(mapped) == list(range(size))
+
+
+def test_product_feed_rotation_without_repeats(test_client, test_app, init_database):
+    """测试商品流按游标翻页，排列用完前不重复，快照重建不影响游标"""
+    with test_app.app_context():
+        _add_products(20)
+        test_app.extensions["catalog"].invalidate()
+
+    seen = []
+    cursor = None
+    for _ in range(4):
+        headers = {"X-Feed-Cursor": cursor} if cursor else {}
+        response = test_client.get("/api/products", headers=headers)
+        assert response.status_code == 200
+        assert len(response.json) == 5
+        assert response.headers["Cache-Control"] == "no-store"
+        seen.extend(p["id"] for p in response.json)
+        cursor = response.headers["X-Feed-Cursor"]
+        # 定期重建（或其他 worker 的快照）内容相同时游标继续有效
+        test_app.extensions["catalog"].invalidate()
+
+    assert len(seen) == len(set(seen)) == 20
+
+    # 被篡改的游标被忽略，重新开始新的排列
+    response = test_client.get("/api/products", headers={"X-Feed-Cursor": "bad"})
+    assert response.status_code == 200
+    assert len(response.json) == 5
+
+
+def test_alias_table_follows_weights():
+    """测试别名表抽样频率与权重成比例"""
+    import random
+    from app.feed import build_alias_table
+
+    weights = [1.0, 1.0, 8.0]
+    prob, alias = build_alias_table(weights)
+    rng = random.Random(42)
+    counts = [0, 0, 0]
+    for _ in range(10000):
+        i = rng.randrange(len(weights))
+        if rng.random() >= prob[i]:
+            i = alias[i]
+        counts[i] += 1
+    assert 0.75 < counts[2] / 10000 < 0.85
+
+
+def test_popular_product_feed(test_client, test_app, init_database):
+    """测试热度商品流：后台刷新后按加购热度加权返回商品"""
+    from app.feed import refresh_popularity_feed
+    from app.models import CartItem, User
+
+    with test_app.app_context():
+        _add_products(20)
+        user = User.query.filter_by(username="123456").first()
+        db.session.add(CartItem(user_id=user.id, product_id="p005", quantity=500))
+        db.session.commit()
+        test_app.extensions["catalog"].invalidate()
+        refresh_popularity_feed()
+        feed = test_app.extensions["popularity_feed"]
+        assert feed.ready
+        assert feed.scores["p005"] > 400
+
+    hits = 0
+    for _ in range(10):
+        response = test_client.get("/api/products?mode=popular")
+        assert response.status_code == 200
+        ids = [p["id"] for p in response.json]
+        assert len(ids) == len(set(ids)) == 5
+        hits += "p005" in ids
+    assert hits >= 9
+
+
+def test_popularity_counts_added_quantity(test_app, init_database):
+    """测试同一购物车记录多次加购时只累加增加的数量，全量刷新时清理已删除的记录"""
+    from app.feed import PopularityFeed
+    from app.models import CartItem, User
+
+    with test_app.app_context():
+        feed = PopularityFeed(half_life_hours=72)
+        user = User.query.filter_by(username="123456").first()
+        item = CartItem(user_id=user.id, product_id="1", quantity=1)
+        db.session.add(item)
+        db.session.commit()
+        feed.refresh(["1", "2"])
+        for quantity in (2, 3):
+            item.quantity = quantity
+            db.session.commit()
+            feed.refresh(["1", "2"])
+        assert feed.scores["1"] == pytest.approx(3, rel=0.01)
+
+        # 定期全量读取时移除已删除记录的数量，并且不重复累加
+        db.session.delete(item)
+        db.session.commit()
+        feed.full_every = 1
+        feed.refresh(["1", "2"])
+        assert feed._quantities == {}
+        assert feed.scores["1"] == pytest.approx(3, rel=0.01)
+
+
+def test_product_detail_not_cached_after_concurrent_update(
+    test_app, init_database, monkeypatch
+):
+    """测试编码期间商品被修改（缓存失效）时，旧的编码结果不写入缓存"""
+    from app import catalog
+
+    cache = test_app.extensions["product_detail_cache"]
+    encode = catalog.encode_product_detail
+
+    def encode_during_update(product, fields=None, fmt="json"):
+        entry = encode(product, fields, fmt)
+        cache.invalidate(product.id)  # 模拟 update_product 提交后使缓存失效
+        return entry
+
+    with test_app.app_context():
+        monkeypatch.setattr(catalog, "encode_product_detail", encode_during_update)
+        assert catalog.product_detail("1") is not None
+        assert cache.peek("1") is None
+
+        monkeypatch.setattr(catalog, "encode_product_detail", encode)
+        entry = catalog.product_detail("1")
+        assert cache.peek("1") == {(None, "json"): entry}
+        assert catalog.product_detail("missing") is None
+        assert cache.peek("missing") is None
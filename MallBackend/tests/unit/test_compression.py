@@ -0,0 +1,85 @@
+import gzip
+import brotli
+import pytest
+from flask import Flask, jsonify
+from app.compression import ResponseCompressor
+from app.http_cache import make_etag, not_modified, with_validators
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    compressor = ResponseCompressor(min_size=100)
+    app.after_request(compressor.process)
+    app.extensions["compressor"] = compressor
+    items = [{"id": i, "name": f"商品{i}"} for i in range(200)]
+
+    @app.route("/big")
+    def big():
+        etag = make_etag("big")
+        cached = not_modified(etag, "no-cache")
+        if cached is not None:
+            return cached
+        return with_validators(jsonify(items), etag, "no-cache")
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/stream")
+    def stream():
+        return app.response_class(
+            (f"line {i}\n" for i in range(100)), mimetype="text/plain"
+        )
+
+    @app.route("/image")
+    def image():
+        return app.response_class(b"\x89PNG" * 100, mimetype="image/png")
+
+    return app.test_client()
+
+
+def test_compresses_by_accept_encoding(client):
+    """测试按 Accept-Encoding 选择 br/gzip，小响应与图片不压缩"""
+    plain = client.get("/big")
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.data) == plain.data
+    assert response.headers["ETag"] == plain.headers["ETag"][:-1] + '-br"'
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == plain.data
+
+    for url in ("/small", "/image"):
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+
+
+def test_compressed_etag_revalidates(client):
+    """测试带编码后缀的 ETag 同样返回304"""
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    response = client.get(
+        "/big",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"].endswith('-gzip"')
+
+
+def test_streams_and_reports_stats(client):
+    """测试流式响应逐块压缩，并按端点统计压缩率与CPU耗时"""
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    expected = "".join(f"line {i}\n" for i in range(100)).encode()
+    assert gzip.decompress(response.data) == expected
+    assert "Content-Length" not in response.headers
+
+    client.get("/big", headers={"Accept-Encoding": "br"})
+    stats = client.application.extensions["compressor"].stats()
+    assert stats["stream"]["bytes_in"] == len(expected)
+    assert stats["big"]["responses"] == 1
+    assert 0 < stats["big"]["ratio"] < 1
+    assert stats["big"]["cpu_ms_per_response"] >= 0
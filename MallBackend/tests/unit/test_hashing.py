@@ -0,0 +1,69 @@
+import os
+import signal
+import time
+import pytest
+from werkzeug.security import check_password_hash
+from app.hashing import HasherBusy, PasswordHasher
+
+
+def test_password_hasher_in_process_pool():
+    """测试进程池中的密码哈希与校验"""
+    hasher = PasswordHasher(workers=1, max_pending=2)
+    try:
+        pwhash = hasher.hash("password123")
+        assert check_password_hash(pwhash, "password123")
+        assert hasher.verify(pwhash, "password123") is True
+        assert hasher.verify(pwhash, "wrongpassword") is False
+    finally:
+        hasher.shutdown()
+
+
+def test_password_hasher_recovers_from_broken_pool():
+    """测试子进程被杀死导致进程池损坏后，下一次调用重建进程池"""
+    hasher = PasswordHasher(workers=1, max_pending=2)
+    try:
+        hasher.start()
+        pids = list(hasher._executor._processes)
+        with pytest.raises(HasherBusy):
+            os.kill(pids[0], signal.SIGKILL)
+            hasher.hash("password123")
+        assert hasher.verify(hasher.hash("password123"), "password123") is True
+    finally:
+        hasher.shutdown()
+
+
+def test_password_hasher_holds_slot_until_job_finishes():
+    """测试超时的任务在实际结束前仍占用排队名额"""
+    hasher = PasswordHasher(workers=1, max_pending=1, timeout=0.1)
+    try:
+        hasher.start()
+        with pytest.raises(HasherBusy):
+            hasher._run(time.sleep, 1)
+        # 超时的任务仍在执行，队列已满
+        assert not hasher._slots.acquire(blocking=False)
+        deadline = time.monotonic() + 5
+        while not hasher._slots.acquire(blocking=False):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        hasher._slots.release()
+    finally:
+        hasher.shutdown()
+
+
+def test_login_returns_503_when_hash_queue_full(test_client, test_app, init_database):
+    """测试哈希队列已满时登录快速返回503"""
+    original = test_app.extensions["password_hasher"]
+    busy = PasswordHasher(workers=0, max_pending=1, retry_after=3)
+    # 占满唯一的排队名额
+    busy._slots.acquire()
+    test_app.extensions["password_hasher"] = busy
+    try:
+        response = test_client.post(
+            "/api/login", json={"username": "123456", "password": "password123"}
+        )
+    finally:
+        test_app.extensions["password_hasher"] = original
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert response.json["status"] == "error"
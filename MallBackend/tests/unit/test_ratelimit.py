@@ -0,0 +1,55 @@
+from app.ratelimit import MemoryBackend, SQLiteBackend, create_backend
+
+
+def test_memory_backend_token_bucket():
+    """测试内存令牌桶的消耗与回填"""
+    backend = MemoryBackend()
+    assert backend.consume("k", rate=1, burst=2, now=100.0) == (True, 0.0)
+    assert backend.consume("k", rate=1, burst=2, now=100.0) == (True, 0.0)
+
+    allowed, wait = backend.consume("k", rate=1, burst=2, now=100.0)
+    assert allowed is False
+    assert wait == 1.0
+
+    # 1秒后回填一个令牌
+    assert backend.consume("k", rate=1, burst=2, now=101.0)[0] is True
+    # 不同的键互不影响
+    assert backend.consume("other", rate=1, burst=2, now=101.0)[0] is True
+
+
+def test_memory_backend_prunes_by_bucket_scope():
+    """测试清理按每个桶自己的速率与容量判断是否回满，不受触发清理的作用域影响"""
+    backend = MemoryBackend(max_keys=2)
+    # 慢速作用域的桶已耗尽，100秒后仍未回满
+    backend.consume("LOGIN_IP:ip", rate=0.001, burst=1, now=100.0)
+    # 快速作用域的请求触发清理
+    backend.consume("LOGIN_USER:a", rate=10, burst=1, now=200.0)
+    backend.consume("LOGIN_USER:b", rate=10, burst=1, now=200.0)
+    assert backend.consume("LOGIN_IP:ip", rate=0.001, burst=1, now=200.0)[0] is False
+
+
+def test_sqlite_backend_shared_between_instances(tmp_path):
+    """测试SQLite后端在多个实例（模拟多个worker）间共享状态"""
+    url = f"sqlite:///{tmp_path / 'ratelimit.db'}"
+    first = create_backend(url)
+    second = create_backend(url)
+    assert isinstance(first, SQLiteBackend)
+
+    assert first.consume("k", rate=1, burst=1, now=100.0)[0] is True
+    assert second.consume("k", rate=1, burst=1, now=100.5)[0] is False
+    assert second.consume("k", rate=1, burst=1, now=101.5)[0] is True
+
+
+def test_login_rate_limited(test_client, test_app, init_database, monkeypatch):
+    """测试登录接口超出限制后返回429"""
+    # monkeypatch 在测试结束后恢复全部修改，避免影响同模块的其他测试
+    monkeypatch.setitem(test_app.config, "RATELIMIT_ENABLED", True)
+    monkeypatch.setitem(test_app.config, "RATELIMIT_LOGIN_USER_RATE", 0.001)
+    monkeypatch.setitem(test_app.config, "RATELIMIT_LOGIN_USER_BURST", 1)
+
+    payload = {"username": "654321", "password": "wrongpassword"}
+    assert test_client.post("/api/login", json=payload).status_code == 401
+    response = test_client.post("/api/login", json=payload)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,249 @@
+from app import db
+from app.ai_proxy import search_products_by_keywords
+from app.search import SearchIndex, query_terms
+
+
+def test_index_incremental_updates():
+    """测试倒排索引的增量新增、更新与删除"""
+    index = SearchIndex()
+    index.build([("1", "华为手机", "高性能旗舰手机"), ("2", "小米手机", "性价比之王")])
+
+    assert sorted(index.rank(query_terms("手机"))) == ["1", "2"]
+    assert index.rank(query_terms("华为手机")) == ["1"]
+    assert sorted(index.rank({"华为", "小米"}, require_all=False)) == ["1", "2"]
+
+    class Item:
+        id, name, description = "3", "华为耳机", "无线降噪"
+
+    index.add(Item)
+    assert index.rank(query_terms("华为")) == ["1", "3"]
+
+    Item.name = "索尼耳机"
+    index.add(Item)
+    assert index.rank(query_terms("华为")) == ["1"]
+
+    index.remove("1")
+    assert index.rank(query_terms("华为")) == []
+    assert len(index) == 2
+
+
+def test_bm25_ranking_prefers_name_matches():
+    """测试 BM25 排序：名称匹配优先于描述匹配，并按k截取"""
+    from collections import Counter
+
+    index = SearchIndex(name_weight=2.0)
+    index.add_terms("desc", Counter({"配件": 1}), Counter({"耳机": 1, "蓝牙": 1}))
+    index.add_terms("name", Counter({"耳机": 1}), Counter({"蓝牙": 1, "降噪": 1}))
+    index.add_terms("both", Counter({"耳机": 1}), Counter({"耳机": 2, "蓝牙": 1}))
+    for i in range(50):
+        index.add_terms(f"other{i}", Counter({"手表": 1}), Counter({"运动": 1}))
+
+    assert index.rank({"耳机"}) == ["both", "name", "desc"]
+    assert index.rank({"耳机"}, k=2) == ["both", "name"]
+    assert index.rank({"耳机", "手表"}) == []
+    ranked = index.rank({"耳机", "手表"}, k=4, require_all=False)
+    assert ranked[:3] == ["both", "name", "desc"] and ranked[3].startswith("other")
+
+    index.remove("both")
+    assert index.rank({"耳机"}) == ["name", "desc"]
+
+
+def test_search_api_uses_index(test_client, test_app, init_database, sql_statements):
+    """测试搜索接口走倒排索引而不是 LIKE 全表扫描"""
+    test_client.get("/api/products/search?q=华为")  # 首次请求构建索引
+    test_app.extensions["search_cache"].clear()
+
+    with sql_statements as statements:
+        response = test_client.get("/api/products/search?q=华为")
+
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json] == ["1"]
+    assert statements and not any("LIKE" in s.upper() for s in statements)
+
+
+def test_search_follows_product_crud(authenticated_client, test_client):
+    """测试商品增删改后搜索结果立即更新"""
+
+    def search(q):
+        return [p["id"] for p in test_client.get(f"/api/products/search?q={q}").json]
+
+    assert search("耳机") == []
+
+    authenticated_client.post(
+        "/api/products",
+        json={"id": "3", "name": "蓝牙耳机", "price": 199, "description": "降噪"},
+    )
+    assert search("耳机") == ["3"]
+
+    authenticated_client.put("/api/products/3", json={"name": "运动手表"})
+    assert search("耳机") == []
+    assert search("手表") == ["3"]
+
+    authenticated_client.delete("/api/products/3")
+    assert search("手表") == []
+
+
+def test_search_syncs_other_worker_changes(test_app, init_database, test_client):
+    """测试其他 worker 修改商品（本进程索引未更新）后，下次搜索即可查到"""
+    from app.changes import mark_product_changed, mark_product_deleted
+    from app.models import Product
+
+    def search(q):
+        return [p["id"] for p in test_client.get(f"/api/products/search?q={q}").json]
+
+    assert search("耳机") == []
+    with test_app.app_context():
+        product = Product(id="3", name="蓝牙耳机", price=199, description="降噪")
+        db.session.add(product)
+        mark_product_changed(product)
+        db.session.commit()
+    assert search("耳机") == ["3"]
+
+    with test_app.app_context():
+        db.session.delete(db.session.get(Product, "3"))
+        mark_product_deleted("3")
+        db.session.commit()
+    assert search("耳机") == []
+
+
+def test_search_single_char_and_fragment(test_client, init_database):
+    """测试单字与跨词片段在精确与容错匹配都无结果时按子串匹配（同原 LIKE 搜索）"""
+
+    def search(q):
+        response = test_client.get(f"/api/products/search?q={q}")
+        return sorted(p["id"] for p in response.json)
+
+    assert search("手") == ["1", "2"]
+    assert search("为手") == ["1"]
+    assert search("之") == ["2"]  # 只出现在描述中
+    assert search("为机") == []  # 字符都在但不连续
+
+
+def test_search_index_compacts_dead_postings(
+    authenticated_client, test_client, test_app
+):
+    """测试反复更新留下的失效文档超过阈值后，下次查询时全量重建"""
+    index = test_app.extensions["search_index"]
+    test_client.get("/api/products/search?q=手机")
+    for price in range(10, 15):
+        authenticated_client.put("/api/products/1", json={"price": price})
+    assert index.dead_ratio() > test_app.config["SEARCH_COMPACT_DEAD_RATIO"]
+
+    response = test_client.get("/api/products/search?q=华为")
+    assert [p["price"] for p in response.json] == [14]
+    assert index.dead_ratio() == 0
+
+
+def test_ai_keyword_search_uses_index(test_app, init_database):
+    """测试AI助手的关键词搜索按匹配度返回商品"""
+    with test_app.app_context():
+        products = search_products_by_keywords(["华为", "手机"])
+        assert [p.id for p in products] == ["1", "2"]
+        assert search_products_by_keywords(["不存在"]) == []
+
+
+def test_suggest_prefix_and_pinyin():
+    """测试自动补全：中文前缀、分词前缀、全拼与拼音首字母"""
+    from app.suggest import SuggestIndex
+
+    index = SuggestIndex()
+    index.build([("1", "华为手机"), ("2", "小米手机"), ("3", "华为Mate耳机")])
+
+    assert [i for i, _ in index.suggest("华为")] == ["1", "3"]
+    assert [i for i, _ in index.suggest("手机")] == ["1", "2"]
+    assert [i for i, _ in index.suggest("xiaom")] == ["2"]
+    assert [i for i, _ in index.suggest("HW")] == ["1", "3"]
+    assert index.suggest("华为", limit=1) == [("1", "华为手机")]
+    assert index.suggest("") == []
+
+    index.add("1", "荣耀手机")
+    assert [i for i, _ in index.suggest("hw")] == ["3"]
+    assert [i for i, _ in index.suggest("ry")] == ["1"]
+    index.remove("3")
+    assert index.suggest("华为") == []
+
+
+def test_suggest_api(authenticated_client, test_client):
+    """测试自动补全接口随商品增删改更新"""
+    response = test_client.get("/api/products/suggest?q=hw")
+    assert response.status_code == 200
+    assert response.json == [{"id": "1", "name": "华为手机"}]
+
+    authenticated_client.post(
+        "/api/products", json={"id": "3", "name": "华为耳机", "price": 299}
+    )
+    response = test_client.get("/api/products/suggest?q=华为&limit=5")
+    assert [p["id"] for p in response.json] == ["1", "3"]
+
+    authenticated_client.delete("/api/products/3")
+    response = test_client.get("/api/products/suggest?q=华为")
+    assert [p["id"] for p in response.json] == ["1"]
+
+
+def test_fuzzy_search_tolerates_typos():
+    """测试三元组容错匹配：错别字与中英文混输，阈值可配置"""
+    index = SearchIndex(fuzzy_threshold=0.4)
+    index.build(
+        [
+            ("1", "华为手机", "高性能旗舰手机"),
+            ("2", "小米手机", "性价比之王"),
+            ("3", "Huawei Watch", "智能手表"),
+        ]
+    )
+
+    assert index.rank(query_terms("华为手击")) == []
+    assert index.fuzzy("华为手击") == ["1"]
+    assert index.fuzzy("huawai watch") == ["3"]
+    assert index.fuzzy("华为手击", threshold=0.9) == []
+
+    index.remove("1")
+    assert index.fuzzy("华为手击") == []
+
+
+def test_search_api_fuzzy_fallback(test_client, init_database):
+    """测试精确搜索无结果时回退到容错匹配"""
+    response = test_client.get("/api/products/search?q=华为")
+    assert response.headers["X-Search-Mode"] == "exact"
+
+    response = test_client.get("/api/products/search?q=华为手击")
+    assert response.status_code == 200
+    assert response.headers["X-Search-Mode"] == "fuzzy"
+    assert [p["id"] for p in response.json] == ["1"]
+
+
+def test_search_result_cache(authenticated_client, test_client, test_app):
+    """测试搜索结果缓存：规范化搜索词命中缓存，商品修改后失效"""
+    cache = test_app.extensions["search_cache"]
+    test_client.get("/api/products/search?q=华为")
+    hits = cache.hits
+    response = test_client.get("/api/products/search?q=%20华为%20")
+    assert cache.hits == hits + 1
+    assert [p["id"] for p in response.json] == ["1"]
+
+    authenticated_client.put("/api/products/1", json={"name": "荣耀手机"})
+    response = test_client.get("/api/products/search?q=华为")
+    assert cache.hits == hits + 1
+    assert response.json == []
+
+    metrics = test_client.get("/api/metrics").json
+    assert metrics["search_cache"]["hits"] == cache.hits
+
+
+def test_warm_search_cache_from_top_queries(test_app, init_database, tmp_path):
+    """测试保存热门搜索词并在下次启动时预热缓存"""
+    from app.search import run_search, save_top_queries, warm_search_cache
+
+    path = str(tmp_path / "top_queries.json")
+    with test_app.app_context():
+        test_app.config["SEARCH_TOP_QUERIES_PATH"] = path
+        for query in ["手机", "手机", "华为"]:
+            run_search(query)
+        save_top_queries()
+
+        cache = test_app.extensions["search_cache"]
+        cache.clear()
+        assert warm_search_cache() >= 2
+        hits = cache.hits
+        products, fuzzy, _ = run_search("手机")
+        assert cache.hits == hits + 1
+        assert not fuzzy and len(products) == 2
@@ -0,0 +1,62 @@
+import threading
+import pytest
+from PIL import Image
+from app.thumbnails import ThumbnailStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    source = tmp_path / "static"
+    source.mkdir()
+    Image.new("RGB", (800, 600), "red").save(source / "big.png")
+    return ThumbnailStore(str(source), str(tmp_path / "thumbs"), widths=(100, 200))
+
+
+def test_thumbnail_resize_and_webp(store):
+    """测试宽度取不小于请求值的可选宽度，并支持输出 WebP"""
+    path, mimetype = store.get("big.png", 150)
+    assert mimetype == "image/png"
+    with Image.open(path) as image:
+        assert image.size == (200, 150)
+
+    path, mimetype = store.get("big.png", 100, "webp")
+    assert mimetype == "image/webp"
+    with Image.open(path) as image:
+        assert image.format == "WEBP"
+        assert image.size == (100, 75)
+
+    with pytest.raises(ValueError):
+        store.get("big.png", 100, "gif")
+    with pytest.raises(FileNotFoundError):
+        store.get("../big.png", 100)
+
+
+def test_thumbnail_concurrent_requests_generate_once(store):
+    """测试同一缩略图的并发请求只生成一次"""
+    barrier = threading.Barrier(8)
+    paths = []
+
+    def worker():
+        barrier.wait()
+        paths.append(store.get("big.png", 200, "webp")[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(paths)) == 1
+    assert store.generated == 1
+    assert store.hits == 7
+
+
+def test_thumbnail_follows_content_hash(store, tmp_path):
+    """测试原图内容变化后生成新的缩略图，后台预生成跳过缺失的图片"""
+    first, _ = store.get("big.png", 100)
+    Image.new("RGB", (400, 400), "blue").save(tmp_path / "static" / "big.png")
+    second, _ = store.get("big.png", 100)
+    assert first != second
+
+    assert store.pregenerate(["big.png", "missing.png", ""]).result() == 4
+    store.shutdown()
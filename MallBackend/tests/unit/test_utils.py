@@ -89,3 +89,27 @@ def test_validate_credentials_edge_cases():
     # 用户名包含非数字字符
     is_valid, message = validate_credentials("123abc", "password")
     assert is_valid is False
+
+
+def test_cleanup_expired_tokens_in_chunks(test_app, init_database):
+    """测试分批清理过期令牌"""
+    from datetime import datetime, timedelta
+    from app import db
+    from app.models import TokenBlacklist
+    from app.utils import cleanup_expired_tokens
+
+    with test_app.app_context():
+        past = datetime.utcnow() - timedelta(hours=1)
+        future = datetime.utcnow() + timedelta(hours=1)
+        for i in range(25):
+            db.session.add(TokenBlacklist(jti=f"expired-{i}", expires_at=past))
+        for i in range(3):
+            db.session.add(TokenBlacklist(jti=f"live-{i}", expires_at=future))
+        db.session.commit()
+
+        stats = cleanup_expired_tokens(chunk_size=10, pause=0)
+
+        assert stats["deleted"] == 25
+        assert stats["chunks"] == 3
+        assert stats["elapsed"] >= 0
+        assert TokenBlacklist.query.count() == 3
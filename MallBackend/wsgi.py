@@ -1,6 +1,9 @@
 from app import create_app
+from app.feed import start_popularity_refresher
 
 app = create_app()
+# run.py 由调度器刷新热度商品流，wsgi 部署在每个 worker 内启动刷新线程
+start_popularity_refresher(app)
 
 if __name__ == "__main__":
     app.run()